@@ -12,22 +12,37 @@ def _load_theme(style: ttk.Style) -> None:
     if not isinstance(style.master, tkinter.Tk):
         raise TypeError("root must be a `tkinter.Tk` instance!")
 
+    # sv.tcl only registers the dark and light variants; each one is
+    # sourced the first time it's used
     if not hasattr(style.master, "_sv_ttk_loaded"):
         style.tk.call("source", str(TCL_THEME_FILE_PATH))
         style.master._sv_ttk_loaded = True  # type: ignore
 
 
+def _get_style(root: tkinter.Tk | None) -> ttk.Style:
+    """Return the Style of root (or the default root), creating it and loading the theme once"""
+    if root is None:
+        root = tkinter._default_root  # type: ignore[attr-defined]
+
+    style = getattr(root, "_sv_ttk_style", None)
+    if style is None:
+        # Creates the default root if there is none yet, or raises
+        # RuntimeError after tkinter.NoDefaultRoot()
+        style = ttk.Style(master=root)
+        _load_theme(style)
+        style.master._sv_ttk_style = style  # type: ignore
+    return style
+
+
 def get_theme(root: tkinter.Tk | None = None) -> str:
-    style = ttk.Style(master=root)
-    _load_theme(style)
+    style = _get_style(root)
 
     theme = style.theme_use()
     return {"sun-valley-dark": "dark", "sun-valley-light": "light"}.get(theme, theme)
 
 
 def set_theme(theme: str, root: tkinter.Tk | None = None) -> None:
-    style = ttk.Style(master=root)
-    _load_theme(style)
+    style = _get_style(root)
 
     theme = theme.lower()
 
@@ -38,10 +53,9 @@ def set_theme(theme: str, root: tkinter.Tk | None = None) -> None:
 
 
 def toggle_theme(root: tkinter.Tk | None = None) -> None:
-    style = ttk.Style(master=root)
-    _load_theme(style)
+    style = _get_style(root)
 
-    set_theme("light" if style.theme_use() == "sun-valley-dark" else "dark")
+    set_theme("light" if style.theme_use() == "sun-valley-dark" else "dark", root=style.master)
 
 
 use_dark_theme = partial(set_theme, "dark")
@@ -1,7 +1,16 @@
 package require Tk 8.6
 
-source [file join [file dirname [info script]] theme light.tcl]
-source [file join [file dirname [info script]] theme dark.tcl]
+# The light and dark variants are sourced on first use, so only the active
+# theme's spritesheet is decoded at startup. ttk::setTheme (which
+# ttk.Style.theme_use calls) runs `package require ttk::theme::<name>` for a
+# theme that doesn't exist yet.
+foreach sv_ttk_variant {light dark} {
+  package ifneeded ttk::theme::sun-valley-$sv_ttk_variant 2.5 [list apply {{file name} {
+    uplevel #0 [list source $file]
+    package provide ttk::theme::$name 2.5
+  }} [file join [file dirname [info script]] theme $sv_ttk_variant.tcl] sun-valley-$sv_ttk_variant]
+}
+unset sv_ttk_variant
 
 
 if {[tk windowingsystem] == "win32"} {
@@ -52,9 +61,9 @@ proc config_menus {w} {
       -borderwidth 1 \
       -activeborderwidth 0 \
       -background "#e7e7e7" \
-      -activebackground $ttk::theme::sv_dark::colors(-selbg) \
-      -activeforeground $ttk::theme::sv_dark::colors(-selfg) \
-      -selectcolor $ttk::theme::sv_dark::colors(-selfg)
+      -activebackground $ttk::theme::sv_light::colors(-selbg) \
+      -activeforeground $ttk::theme::sv_light::colors(-selfg) \
+      -selectcolor $ttk::theme::sv_light::colors(-selfg)
   }
 
   if {[[winfo toplevel $w] cget -menu] != $w} {
@@ -0,0 +1,204 @@
+"""
+Micro-benchmarks for the local pipeline stages.
+
+Times validate_image_file, each step of ImageProcessor.prepare_image
+(decode, convert, resize, encode), the preview thumbnail and extract_date
+on generated synthetic journal pages, and writes the results as JSON.
+
+Usage:
+    python benchmarks/bench_pipeline.py -o bench.json
+    python benchmarks/bench_pipeline.py -o bench.json --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import PIL
+from PIL import Image, ImageDraw, ImageFont
+
+from date_extractor import extract_date
+from image_processor import ImageProcessor
+from utils import ImageHandle, validate_image_file
+
+RESOLUTIONS = [(1600, 1200), (3024, 4032), (4000, 6000)]
+FORMATS = ['.jpeg', '.png']
+PREVIEW_SIZE = (300, 300)  # Same as JournalTranscriberApp._update_preview
+
+WORDS = ("today went walk coffee morning tired slept early friends dinner "
+         "work meeting rain sunny wrote read thought about family plans").split()
+MONTHS = ["January", "Feb", "March", "Apr", "May", "June", "Jul", "August", "Sept", "Oct", "November", "Dec"]
+
+
+def make_journal_image(path, size, seed=0):
+    """
+    Write a synthetic journal page with ruled lines of dark text. JPEGs get
+    sensor-like paper noise, as phone photos do; PNGs use a clean background,
+    like flatbed scans.
+    """
+    rng = random.Random(seed)
+    width, height = size
+    if path.lower().endswith(('.jpg', '.jpeg')):
+        img = Image.merge('RGB', [Image.effect_noise(size, 12).point(lambda v: v // 8 + 225)] * 3)
+    else:
+        img = Image.new('RGB', size, (245, 243, 235))
+    draw = ImageDraw.Draw(img)
+    line_height = max(24, height // 40)
+    font = ImageFont.load_default(size=int(line_height * 0.7))
+
+    for y in range(line_height * 2, height - line_height, line_height):
+        draw.line([(0, y + line_height - 4), (width, y + line_height - 4)], fill=(170, 190, 220), width=2)
+        text = ' '.join(rng.choice(WORDS) for _ in range(width // (line_height * 3)))
+        draw.text((line_height, y), text, fill=(30, 30, 60), font=font)
+
+    img.save(path, quality=90)
+
+
+def make_text_corpus(count, seed=0):
+    """Generate transcription-like texts with dates in the supported formats"""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        year, month, day = rng.randint(2000, 2030), rng.randint(1, 12), rng.randint(1, 28)
+        date = rng.choice([
+            f"{year}-{month:02d}-{day:02d}",
+            f"{day}/{month}/{year}",
+            f"{MONTHS[month - 1]} {day}, {year}",
+            "",  # Some entries have no date at all
+        ])
+        body = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(50, 400)))
+        texts.append(f"{date}\n\n{body}" if i % 2 else f"{body}\n{date}")
+    return texts
+
+
+def time_call(func, repeat, setup=None):
+    """
+    Run func `repeat` times and return timing stats in seconds.
+    setup() is called before each run, outside the timed region, and its
+    return value is passed to func.
+    """
+    timings = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        func(arg) if setup else func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'mean_s': statistics.fmean(timings),
+        'runs': repeat,
+    }
+
+
+def bench_image_stages(path, processor, repeat):
+    file_ext = os.path.splitext(path)[1]
+    handle = ImageHandle(path)
+    decoded = handle.decode(processor.max_dimension)
+    converted = processor._convert(decoded)
+    resized = processor._resize(converted)
+
+    return {
+        'validate_image_file': time_call(lambda: validate_image_file(path), repeat),
+        'prepare.decode': time_call(lambda h: h.decode(processor.max_dimension), repeat,
+                                    setup=lambda: ImageHandle(path)),
+        'prepare.convert': time_call(lambda: processor._convert(decoded), repeat),
+        'prepare.resize': time_call(lambda: processor._resize(converted), repeat),
+        'prepare.encode': time_call(lambda: processor._encode(resized, file_ext), repeat),
+        'prepare_image': time_call(lambda: processor.prepare_image(path), repeat),
+        'preview_thumbnail': time_call(lambda h: h.thumbnail(PREVIEW_SIZE), repeat,
+                                       setup=lambda: ImageHandle(path)),
+    }
+
+
+def run_benchmarks(repeat=5, corpus_size=2000):
+    results = {}
+    processor = ImageProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for width, height in RESOLUTIONS:
+            for file_ext in FORMATS:
+                path = os.path.join(tmp_dir, f"page_{width}x{height}{file_ext}")
+                make_journal_image(path, (width, height))
+                for stage, stats in bench_image_stages(path, processor, repeat).items():
+                    results[f"{stage}[{width}x{height}{file_ext}]"] = stats
+
+    corpus = make_text_corpus(corpus_size)
+
+    def extract_all():
+        for text in corpus:
+            try:
+                extract_date(text)
+            except ValueError:
+                pass
+
+    results[f"extract_date[{corpus_size} texts]"] = time_call(extract_all, repeat)
+    return results
+
+
+def compare(results, baseline, threshold, min_delta=0.0005):
+    """
+    Return (name, baseline median, current median) for every benchmark whose
+    median got slower than the baseline by more than threshold (a fraction).
+    Slowdowns smaller than min_delta seconds are timer noise and ignored.
+    """
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['median_s'], stats['median_s']
+        if after > before * (1 + threshold) and after - before > min_delta:
+            regressions.append((name, before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the local pipeline stages.")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="JSON file for the results")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="Runs per benchmark (default: 5)")
+    parser.add_argument("--corpus-size", type=int, default=2000, help="Texts for the extract_date benchmark")
+    parser.add_argument("--compare", metavar="BASELINE", help="Flag regressions against a previous results file")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Allowed slowdown before flagging a regression (default: 0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeat, args.corpus_size)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in results.items():
+        print(f"{name:55s} {stats['median_s'] * 1000:10.2f} ms")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms "
+                  f"(+{(after / before - 1) * 100:.0f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
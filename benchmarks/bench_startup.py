@@ -0,0 +1,206 @@
+"""
+Import-time benchmark for the entry points.
+
+Imports each entry-point module in a fresh interpreter with -X importtime,
+records the cumulative import time and the heaviest modules it pulled in,
+and checks that modules which must load lazily (the Gemini SDK, tkinter,
+PIL.ImageTk) were not imported. With --window it also measures
+time-to-first-window: from launching a fresh interpreter until the GUI's
+main window (or a bare window with the Sun Valley theme) is mapped. That
+needs a display (e.g. xvfb-run). Results are written as JSON.
+
+Usage:
+    python benchmarks/bench_startup.py -o startup.json
+    python benchmarks/bench_startup.py -o startup.json --window --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_pipeline import compare
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+SV_TTK_DIR = os.path.join(SRC_DIR, 'Sun_Valley')
+
+# Entry-point module -> modules it must not import at startup
+TARGETS = {
+    'cli': ('tkinter', 'google.generativeai', 'flask'),
+    'batch': ('tkinter', 'google.generativeai'),
+    'main': ('tkinter', 'google.generativeai'),
+    'transcript_index': ('tkinter', 'google.generativeai', 'PIL'),
+    'journal_store': ('tkinter', 'google.generativeai', 'PIL'),
+    'gui': ('google.generativeai', 'PIL.ImageTk'),
+}
+
+# Window benchmarks: each script prints a line once its first window is mapped
+WINDOW_SCRIPTS = {
+    'gui': """
+import gui
+app = gui.JournalTranscriberApp()
+app.root.wait_visibility()
+print('mapped', flush=True)
+app.root.destroy()
+""",
+    'sv_ttk': """
+import tkinter
+from tkinter import ttk
+import sv_ttk
+root = tkinter.Tk()
+ttk.Button(root, text='Button').pack()
+sv_ttk.set_theme('dark')
+root.wait_visibility()
+print('mapped', flush=True)
+root.destroy()
+""",
+}
+
+
+def _env(**overrides):
+    return dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, SV_TTK_DIR]), PYTHONWARNINGS='ignore',
+                **overrides)
+
+
+def parse_importtime(stderr):
+    """
+    Parse -X importtime output into {module: (self us, cumulative us)}
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure_import(module):
+    """Import module in a fresh interpreter; returns {module: (self us, cumulative us)}"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               capture_output=True, text=True, env=_env(), cwd=SRC_DIR)
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+    return parse_importtime(completed.stderr)
+
+
+def measure_first_window(script, home):
+    """Seconds from starting a fresh interpreter until script reports its window mapped"""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, env=_env(HOME=home), cwd=SRC_DIR)
+    line = process.stdout.readline()
+    elapsed = time.perf_counter() - start
+    _, stderr = process.communicate()
+    if line.strip() != 'mapped':
+        raise RuntimeError(f"no window was mapped:\n{stderr[-2000:]}")
+    return elapsed
+
+
+def run_window_benchmarks(repeat=5):
+    """Time-to-first-window results, in the same format as run_benchmarks"""
+    results = {}
+    # A scratch HOME keeps the GUI's caches and index out of the real one
+    with tempfile.TemporaryDirectory() as home:
+        for name, script in WINDOW_SCRIPTS.items():
+            timings = [measure_first_window(script, home) for _ in range(repeat)]
+            results[f"first_window[{name}]"] = {
+                'median_s': statistics.median(timings),
+                'min_s': min(timings),
+                'mean_s': statistics.fmean(timings),
+                'runs': repeat,
+            }
+    return results
+
+
+def run_benchmarks(repeat=5, top=5):
+    """
+    Returns:
+        tuple: (results in bench_pipeline's format, {module: details})
+    """
+    results, details = {}, {}
+    for module, forbidden in TARGETS.items():
+        timings, runs = [], []
+        for _ in range(repeat):
+            imported = measure_import(module)
+            timings.append(imported[module][1] / 1e6)
+            runs.append(imported)
+        # The module list is the same every run; the heaviest are taken from the median run
+        median_run = sorted(runs, key=lambda imported: imported[module][1])[len(runs) // 2]
+        heaviest = sorted(median_run.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        results[f"import[{module}]"] = {
+            'median_s': statistics.median(timings),
+            'min_s': min(timings),
+            'mean_s': statistics.fmean(timings),
+            'runs': repeat,
+        }
+        details[module] = {
+            'modules': len(median_run),
+            'heaviest': [{'module': name, 'self_ms': self_us / 1000} for name, (self_us, _) in heaviest],
+            'forbidden_imported': sorted(name for name in forbidden
+                                         if any(imported == name or imported.startswith(name + '.')
+                                                for imported in median_run)),
+        }
+    return results, details
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark entry-point import times.")
+    parser.add_argument("-o", "--output", default="startup_results.json", help="JSON file for the results")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="Runs per module (default: 5)")
+    parser.add_argument("--window", action="store_true",
+                        help="Also measure time-to-first-window (needs a display)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Flag regressions against a previous results file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown before flagging a regression (default: 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results, details = run_benchmarks(args.repeat)
+    if args.window:
+        results.update(run_window_benchmarks(args.repeat))
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+        'details': details,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    failed = False
+    for module, info in details.items():
+        stats = results[f"import[{module}]"]
+        heaviest = ', '.join(f"{item['module']} {item['self_ms']:.1f}" for item in info['heaviest'][:3])
+        print(f"{module:20s} {stats['median_s'] * 1000:8.1f} ms  {info['modules']:4d} modules  (heaviest: {heaviest})")
+        if info['forbidden_imported']:
+            failed = True
+            print(f"EAGER IMPORT {module}: {', '.join(info['forbidden_imported'])} should load on first use")
+    for name, stats in results.items():
+        if name.startswith('first_window'):
+            print(f"{name:20s} {stats['median_s'] * 1000:8.1f} ms")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold, min_delta=0.005)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms "
+                  f"(+{(after / before - 1) * 100:.0f}%)")
+        if regressions:
+            failed = True
+        else:
+            print(f"No regressions beyond {args.threshold:.0%}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+End-to-end load test against a local fake Gemini backend.
+
+Generates N synthetic journal pages, pushes them through the real batch
+runner or the HTTP service's job queue with fake_backend.FakeGeminiModel
+in place of Gemini, and reports throughput and p50/p95/p99 latency for
+every pipeline stage (the metrics spans) plus end to end. Nothing touches
+the network or the real caches: the run uses a scratch directory as HOME.
+
+In service mode jobs are submitted open-loop at --rate images/sec (jobs
+the full queue rejects are counted, not retried). In batch mode --rate
+becomes the client's requests-per-minute limit, which is how a batch run
+is paced.
+
+Usage:
+    python benchmarks/load_test.py --mode batch -n 200 --workers 8 --latency lognormal:1.0,0.4
+    python benchmarks/load_test.py --mode service -n 300 --rate 5 --throttle-rate 0.05 -o load.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import queue
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from bench_pipeline import make_journal_image
+
+from hedging import LatencyWindow
+
+PERCENTILES = (50, 95, 99)
+
+
+class StageSink:
+    """Metrics sink keeping every span's durations, by span name"""
+    def __init__(self, size):
+        self.windows = defaultdict(lambda: LatencyWindow(size))
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        with self._lock:
+            window = self.windows[event['span']]
+            if 'error' in event:
+                self.errors[event['span']] += 1
+        window.record(event['duration_s'])
+
+
+def make_images(directory, count, size, seed):
+    """Write count distinct journal pages, so none is answered from the transcription cache"""
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"page_{i:05d}.jpeg")
+        make_journal_image(path, size, seed=seed * 1_000_003 + i)
+        paths.append(path)
+    return paths
+
+
+def summarize(window, elapsed):
+    stats = {'count': len(window), 'per_s': len(window) / elapsed if elapsed else 0.0}
+    for percent in PERCENTILES:
+        stats[f"p{percent}_s"] = window.percentile(percent)
+    return stats
+
+
+def run_batch_mode(args, model, paths, sink):
+    from batch import run_batch
+    from api_client import GeminiAPIClient
+    from image_processor import ImageProcessor
+
+    rpm = math.ceil(args.rate * 60 / args.pack_size) if args.rate else None
+    api_client = GeminiAPIClient(model=model, requests_per_minute=rpm)
+    # A batch is closed-loop, so its "end to end" is each file's time from the start of the run
+    time_to_result = sink.windows['time_to_result']
+    started = time.perf_counter()
+
+    def on_result(path, output_path, error):
+        time_to_result.record(time.perf_counter() - started)
+
+    succeeded, failures, elapsed = run_batch(paths, api_client, ImageProcessor(), args.workers,
+                                             log=lambda message: None, pack_size=args.pack_size,
+                                             on_result=on_result, prepare_processes=args.prepare_processes)
+    return {'submitted': len(paths), 'succeeded': succeeded, 'failed': len(failures), 'rejected': 0,
+            'elapsed_s': elapsed}
+
+
+def run_service_mode(args, model, paths, sink):
+    from main import TranscriptionService
+
+    service = TranscriptionService(workers=args.workers, max_queue_depth=args.queue_depth, model=model)
+    end_to_end = sink.windows['end_to_end']
+    jobs, rejected = [], 0
+    start = time.perf_counter()
+    for i, path in enumerate(paths):
+        if args.rate:
+            delay = start + i / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        try:
+            jobs.append(service.submit(path))
+        except queue.Full:
+            rejected += 1
+
+    succeeded = failed = 0
+    for job in jobs:
+        with job.changed:
+            job.changed.wait_for(lambda: job.finished is not None)
+        end_to_end.record(job.finished - job.created)
+        if job.status == 'done':
+            succeeded += 1
+        else:
+            failed += 1
+    return {'submitted': len(paths), 'succeeded': succeeded, 'failed': failed, 'rejected': rejected,
+            'elapsed_s': time.perf_counter() - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the pipeline against a fake Gemini backend.")
+    parser.add_argument("--mode", choices=("batch", "service"), default="batch",
+                        help="Drive the batch runner or the service's job queue (default: batch)")
+    parser.add_argument("-n", "--images", type=int, default=100, help="Synthetic images to send (default: 100)")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Target images/sec; 0 sends as fast as the pipeline takes them (default: 0)")
+    parser.add_argument("-j", "--workers", type=int, default=8, help="Worker threads (default: 8)")
+    parser.add_argument("--size", default="1600x1200", help="Image size WxH (default: 1600x1200)")
+    parser.add_argument("--pack-size", type=int, default=1, help="Pages per request, batch mode only (default: 1)")
+    parser.add_argument("--prepare-processes", type=int, default=0,
+                        help="Prepare images in worker processes, batch mode only (default: 0, in-process)")
+    parser.add_argument("--queue-depth", type=int, default=64, help="Service job queue depth (default: 64)")
+    parser.add_argument("--latency", default="lognormal:1.0,0.4",
+                        help="Fake request latency: const:S, uniform:A,B, exp:MEAN or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered 503")
+    parser.add_argument("--quota-rpm", type=int, help="Server-side requests-per-minute quota of the fake backend")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the images and the fake backend")
+    parser.add_argument("-o", "--output", help="JSON file for the results")
+    args = parser.parse_args(argv)
+
+    try:
+        width, height = (int(value) for value in args.size.lower().split('x'))
+    except ValueError:
+        parser.error("--size must look like 1600x1200")
+    if args.images < 1 or args.workers < 1 or args.pack_size < 1:
+        parser.error("--images, --workers and --pack-size must be at least 1")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Caches, index and manifest default to ~/.cache; keep them out of the real one
+        os.environ['HOME'] = os.environ['USERPROFILE'] = scratch
+        from fake_backend import FakeGeminiModel
+        from metrics import metrics
+
+        try:
+            model = FakeGeminiModel(args.latency, throttle_rate=args.throttle_rate, error_rate=args.error_rate,
+                                    requests_per_minute=args.quota_rpm, seed=args.seed)
+        except ValueError as e:
+            parser.error(str(e))
+
+        images_dir = os.path.join(scratch, 'images')
+        os.makedirs(images_dir)
+        print(f"Generating {args.images} {width}x{height} images...")
+        paths = make_images(images_dir, args.images, (width, height), args.seed)
+
+        sink = StageSink(size=max(1000, args.images * 20))
+        metrics.add_sink(sink)
+        rate = f"{args.rate:g} images/sec" if args.rate else "unpaced"
+        print(f"Running {args.mode} mode: {args.images} images, {args.workers} workers, {rate}, "
+              f"latency {args.latency}")
+        try:
+            if args.mode == "batch":
+                totals = run_batch_mode(args, model, paths, sink)
+            else:
+                totals = run_service_mode(args, model, paths, sink)
+        finally:
+            metrics.remove_sink(sink)
+
+    elapsed = totals['elapsed_s']
+    totals['throughput_per_s'] = totals['succeeded'] / elapsed if elapsed else 0.0
+    stages = {name: summarize(window, elapsed) for name, window in sorted(sink.windows.items())}
+    for name, count in sink.errors.items():
+        stages[name]['errors'] = count
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'args': vars(args),
+        },
+        'totals': totals,
+        'backend': dict(model.stats),
+        'stages': stages,
+    }
+
+    print(f"{totals['succeeded']} succeeded, {totals['failed']} failed, {totals['rejected']} rejected "
+          f"in {elapsed:.1f}s ({totals['throughput_per_s']:.2f} images/sec)")
+    print(f"Backend: {model.stats['requests']} requests, {model.stats['throttled']} throttled, "
+          f"{model.stats['errors']} errors")
+    print(f"{'stage':24s} {'count':>7s} {'per sec':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for name, stats in stages.items():
+        if not stats['count']:
+            continue
+        percentiles = ' '.join(f"{stats[f'p{percent}_s'] * 1000:9.1f}" for percent in PERCENTILES)
+        print(f"{name:24s} {stats['count']:7d} {stats['per_s']:8.2f} {percentiles}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    return 0 if totals['succeeded'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -38,6 +38,28 @@ def test_toggle_theme():
     assert sv_ttk.get_theme() == "light"
 
 
+def test_only_active_variant_is_loaded():
+    root = tkinter.Tk()
+    sv_ttk.set_theme("dark", root=root)
+    assert "sun-valley-dark" in ttk.Style(root).theme_names()
+    assert "sun-valley-light" not in ttk.Style(root).theme_names()
+
+    sv_ttk.toggle_theme(root=root)
+    assert sv_ttk.get_theme(root=root) == "light"
+    assert "sun-valley-dark" in ttk.Style(root).theme_names()
+    root.destroy()
+
+
+def test_style_is_cached_per_root():
+    root = tkinter.Tk()
+    sv_ttk.set_theme("light", root=root)
+    style = root._sv_ttk_style
+    sv_ttk.toggle_theme(root=root)
+    assert sv_ttk.get_theme(root=root) == "dark"
+    assert root._sv_ttk_style is style
+    root.destroy()
+
+
 def test_no_default_root():
     tkinter.NoDefaultRoot()
     with pytest.raises(RuntimeError):
@@ -1,40 +1,721 @@
+import asyncio
+import io
+import json
+import math
 import os
-import google.generativeai as genai
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from PIL import Image
+from image_processor import PreparedImage
+from metrics import metrics
+from rate_limiter import (FATAL, THROTTLED, CircuitBreaker, RetryPolicy, TokenBucket,
+                          classify_error, retry_after_hint)
+
+MODEL_NAME = 'gemini-2.0-flash'
+
+TRANSCRIPTION_PROMPT = """
+            Please transcribe the handwritten text in this journal entry image.
+            Focus on accurate text transcription and maintain the original formatting.
+            Include any dates that appear in the text.
+            """
+
+PACKED_TRANSCRIPTION_PROMPT = """
+            Please transcribe the handwritten text in each of the {count} journal entry images below.
+            Each image is preceded by its page label ("Page 1", "Page 2", ...).
+            Focus on accurate text transcription and maintain the original formatting.
+            Include any dates that appear in the text.
+            Respond with a JSON array of exactly {count} strings: the transcription of
+            each page, in page order, and nothing else.
+            """
+
+# Gemini bills images in 768x768 tiles of 258 tokens each
+IMAGE_TILE_SIZE = 768
+TOKENS_PER_IMAGE_TILE = 258
+# Rough output size of one transcribed journal page, used to budget packed requests
+EXPECTED_OUTPUT_TOKENS_PER_PAGE = 600
+DEFAULT_PACK_TOKEN_BUDGET = 8192
+# Allowance for the prompt text when estimating a request's tokens
+PROMPT_TOKENS = 100
+
+
+def estimate_image_tokens(size):
+    """Estimate the input tokens Gemini charges for an image of the given (width, height)"""
+    width, height = size
+    return math.ceil(width / IMAGE_TILE_SIZE) * math.ceil(height / IMAGE_TILE_SIZE) * TOKENS_PER_IMAGE_TILE
+
+
+class TranscriptionAPIError(Exception):
+    """
+    A transcription request failed for good (after any retries).
+    kind is THROTTLED, TRANSIENT or FATAL, see rate_limiter.classify_error.
+    """
+    def __init__(self, message, kind=FATAL):
+        super().__init__(message)
+        self.kind = kind
+
+
+def _import_genai():
+    # The SDK pulls in protobuf and grpc, about a second of startup, so it is
+    # only imported once a client is actually created
+    import google.generativeai as genai
+    return genai
+
+
+def _make_model(api_key, model_name):
+    """
+    A GenerativeModel whose requests are sent with api_key. genai.configure()
+    sets one key for the whole process, so a model gets its own transport
+    clients instead, and clients with different keys can run side by side.
+
+    Returns:
+        tuple: (model, the SDK client manager holding api_key). The asyncio
+        client needs an event loop, so it is made on first async use
+        (_use_async_client) rather than here, on whichever thread builds the model.
+    """
+    genai = _import_genai()
+    from google.generativeai import client as genai_client
+
+    clients = genai_client._ClientManager()
+    clients.configure(api_key=api_key)
+    model = genai.GenerativeModel(model_name)
+    model._client = clients.make_client('generative')
+    return model, clients
+
+
+def _close_model(model):
+    """Close the transport clients a _make_model model was given"""
+    model._client.transport.close()
+    if model._async_client is None:
+        return
+    # The asyncio transport closes with a coroutine
+    closing = model._async_client.transport.close()
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(closing)
+    else:
+        asyncio.ensure_future(closing)
+
+
+def _run_in_thread(fn, *args, **kwargs):
+    """Call fn on a new daemon thread; returns a Future for its result"""
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True, name='gemini-request').start()
+    return future
+
 
 class GeminiAPIClient:
-    def __init__(self, api_key=None):
-        if not api_key:
-            raise ValueError("Gemini API key is required")
+    def __init__(self, api_key=None, model_name=MODEL_NAME, max_concurrency=8, cache=None,
+                 requests_per_minute=None, tokens_per_minute=None,
+                 retry_policy=None, circuit_breaker=None, hedge_policy=None,
+                 concurrency_limiter=None, model=None):
+        # model: backend with genai.GenerativeModel's generate_content(_async)
+        # interface, e.g. fake_backend.FakeGeminiModel; built from model_name
+        # (which needs an API key) when omitted
+        self._owns_model = model is None
+        self._sdk_clients = None  # Client manager of a model built here, see _make_model
+        if model is None:
+            if not api_key:
+                raise ValueError("Gemini API key is required")
+            model, self._sdk_clients = _make_model(api_key, model_name)
+        self.model_name = model_name
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.cache = cache  # Optional TranscriptionCache
 
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        # Client-side quota limits shared by every thread/task using this client; None disables
+        self.request_limiter = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_limiter = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        # Optional HedgePolicy for single-page requests; packed requests are never hedged
+        self.hedge_policy = hedge_policy
+        self._hedge_executor = None
+        # Optional AdaptiveConcurrencyLimiter shared by the threads calling this client
+        self.concurrency_limiter = concurrency_limiter
 
-    def transcribe_image(self, image_path):
+    def transcribe_image(self, image):
         """
         Transcribe handwritten text from an image using Gemini API
 
         Args:
-            image_path: Path to the image file
+            image: PreparedImage from ImageProcessor, or path to an image file
 
         Returns:
             str: Transcribed text
         """
         try:
-            image = Image.open(image_path)
+            with metrics.span('transcribe', model=self.model_name, source=self._source_path(image)) as span:
+                cache_key = self._cache_key(image)
+                if cache_key:
+                    cached = self.cache.get(cache_key)
+                    if cached is not None:
+                        span.set(cache_hit=True)
+                        return cached
 
-            prompt = """
-            Please transcribe the handwritten text in this journal entry image.
-            Focus on accurate text transcription and maintain the original formatting.
-            Include any dates that appear in the text.
-            """
+                span.set(cache_hit=False, bytes_uploaded=self._upload_size(image))
+                response = self._generate([TRANSCRIPTION_PROMPT, self._image_part(image)],
+                                          self._estimate_tokens([image]), hedge=True)
+                span.set(**self._usage_attrs(response))
+                text = self._response_text(response)
+
+                if cache_key:
+                    self.cache.put(cache_key, text)
+                return text
+
+        except Exception as e:
+            raise TranscriptionAPIError(f"API transcription error: {str(e)}", classify_error(e)) from e
+
+    async def transcribe_image_async(self, image):
+        """
+        Async version of transcribe_image using the SDK's async generation path.
+        The request does not block the event loop while waiting on the network,
+        and an image file is read and measured on a worker thread.
+
+        Args:
+            image: PreparedImage from ImageProcessor, or path to an image file
+
+        Returns:
+            str: Transcribed text
+        """
+        try:
+            with metrics.span('transcribe', model=self.model_name, source=self._source_path(image)) as span:
+                if not isinstance(image, PreparedImage):
+                    image = await asyncio.to_thread(self._load_file, image)
+                cache_key = self._cache_key(image)
+                if cache_key:
+                    cached = self.cache.get(cache_key)
+                    if cached is not None:
+                        span.set(cache_hit=True)
+                        return cached
+
+                span.set(cache_hit=False, bytes_uploaded=self._upload_size(image))
+                response = await self._generate_async([TRANSCRIPTION_PROMPT, self._image_part(image)],
+                                                      self._estimate_tokens([image]), hedge=True)
+                span.set(**self._usage_attrs(response))
+                text = self._response_text(response)
+
+                if cache_key:
+                    self.cache.put(cache_key, text)
+                return text
+
+        except Exception as e:
+            raise TranscriptionAPIError(f"API transcription error: {str(e)}", classify_error(e)) from e
+
+    def transcribe_image_stream(self, image):
+        """
+        Transcribe an image like transcribe_image, but yield the text in
+        chunks as the model generates it. A cached transcription is yielded
+        as a single chunk. Retries and hedging only cover the initial request
+        (up to the first chunk); an error part way through the stream is
+        raised to the caller.
+
+        Args:
+            image: PreparedImage from ImageProcessor, or path to an image file
 
-            response = self.model.generate_content([prompt, image])
+        Yields:
+            str: Text chunks; joined and stripped they are the full transcription
+        """
+        try:
+            with metrics.span('transcribe.stream', model=self.model_name, source=self._source_path(image)) as span:
+                cache_key = self._cache_key(image)
+                if cache_key:
+                    cached = self.cache.get(cache_key)
+                    if cached is not None:
+                        span.set(cache_hit=True)
+                        yield cached
+                        return
+
+                span.set(cache_hit=False, bytes_uploaded=self._upload_size(image))
+                started = time.perf_counter()
+                estimated_tokens = self._estimate_tokens([image])
+                response, slot = self._send([TRANSCRIPTION_PROMPT, self._image_part(image)],
+                                            estimated_tokens, hedge=True, stream=True)
+                # The request is in flight until the stream ends: hold its concurrency slot and
+                # settle the circuit breaker and token quota only then, whatever the outcome
+                chunks, completed, error = [], False, None
+                try:
+                    for chunk in response:
+                        text = self._chunk_text(chunk)
+                        if not text:
+                            continue
+                        if not chunks:
+                            span.set(first_chunk_s=time.perf_counter() - started)
+                        chunks.append(text)
+                        yield text
+                    completed = True
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    # Not completed and no error: the caller stopped reading part way
+                    self._finish(response, slot, estimated_tokens, succeeded=completed, error=error)
+
+                span.set(**self._usage_attrs(response))
+                text = ''.join(chunks).strip()
+                if not text:
+                    raise ValueError("No text was transcribed from the image")
+                if cache_key:
+                    self.cache.put(cache_key, text)
+
+        except Exception as e:
+            raise TranscriptionAPIError(f"API transcription error: {str(e)}", classify_error(e)) from e
+
+    async def transcribe_many_async(self, images, max_concurrency=None, return_exceptions=False):
+        """
+        Transcribe several images concurrently on the current event loop.
+
+        Args:
+            images: Iterable of PreparedImage objects or image file paths
+            max_concurrency: Maximum requests in flight (default: self.max_concurrency)
+            return_exceptions: Return failures in place of results instead of raising
+
+        Returns:
+            list: Transcribed text for each image, in input order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def transcribe_bounded(image):
+            async with semaphore:
+                return await self.transcribe_image_async(image)
+
+        return await asyncio.gather(
+            *(transcribe_bounded(image) for image in images),
+            return_exceptions=return_exceptions,
+        )
+
+    def transcribe_images_packed(self, images, pack_size=4, token_budget=DEFAULT_PACK_TOKEN_BUDGET,
+                                 return_exceptions=False):
+        """
+        Transcribe several pages with as few requests as possible by sending
+        up to pack_size images in one generate_content call.
 
-            if response.text:
-                return response.text.strip()
+        Packs are also cut so that their estimated input tokens plus expected
+        output tokens stay within token_budget. If a packed response can't be
+        split back into one transcription per page, the pages in that pack
+        are transcribed one by one instead.
+
+        Args:
+            images: List of PreparedImage objects
+            pack_size: Maximum number of pages per request
+            token_budget: Maximum estimated tokens (input + output) per request
+            return_exceptions: Return each failed page's error in its place
+                instead of raising, so one bad page or pack doesn't lose the rest
+
+        Returns:
+            list: Transcribed text (or exception) for each image, in input order
+        """
+        results = [None] * len(images)
+        pending = []
+        for index, image in enumerate(images):
+            cache_key = self._cache_key(image)
+            cached = self.cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                results[index] = cached
             else:
-                raise ValueError("No text was transcribed from the image")
+                pending.append((index, image, cache_key))
+
+        for pack in self._build_packs(pending, pack_size, token_budget):
+            try:
+                texts = self._transcribe_pack([image for _, image, _ in pack]) if len(pack) > 1 else None
+            except TranscriptionAPIError as e:
+                if not return_exceptions:
+                    raise
+                texts = [e] * len(pack)
+            if texts is None:
+                # Single page, or the packed response could not be split
+                texts = [self._transcribe_page(image, return_exceptions) for _, image, _ in pack]
+            else:
+                for (_, _, cache_key), text in zip(pack, texts):
+                    if cache_key and not isinstance(text, Exception):
+                        self.cache.put(cache_key, text)
+
+            for (index, _, _), text in zip(pack, texts):
+                results[index] = text
+
+        return results
 
+    def _transcribe_page(self, image, return_exceptions):
+        try:
+            return self.transcribe_image(image)
+        except TranscriptionAPIError as e:
+            if not return_exceptions:
+                raise
+            return e
+
+    @staticmethod
+    def _build_packs(pending, pack_size, token_budget):
+        packs = []
+        current, current_tokens = [], 0
+        for item in pending:
+            tokens = estimate_image_tokens(item[1].size) + EXPECTED_OUTPUT_TOKENS_PER_PAGE
+            if current and (len(current) >= pack_size or current_tokens + tokens > token_budget):
+                packs.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += tokens
+        if current:
+            packs.append(current)
+        return packs
+
+    def _transcribe_pack(self, images):
+        """
+        Send several pages in one request. Returns one text per page, or None
+        if the response could not be split into exactly that many pages.
+        """
+        parts = [PACKED_TRANSCRIPTION_PROMPT.format(count=len(images))]
+        for page, image in enumerate(images, start=1):
+            parts.extend([f"Page {page}:", self._image_part(image)])
+
+        try:
+            with metrics.span('transcribe.packed', model=self.model_name, pages=len(images)) as span:
+                span.set(bytes_uploaded=sum(self._upload_size(image) for image in images))
+                response = self._generate(parts, self._estimate_tokens(images),
+                                          generation_config={'response_mime_type': 'application/json'})
+                span.set(**self._usage_attrs(response))
         except Exception as e:
-            raise Exception(f"API transcription error: {str(e)}")
\ No newline at end of file
+            raise TranscriptionAPIError(f"API transcription error: {str(e)}", classify_error(e)) from e
+
+        try:
+            texts = json.loads(response.text)
+        except ValueError:
+            return None
+
+        if (not isinstance(texts, list) or len(texts) != len(images)
+                or not all(isinstance(text, str) and text.strip() for text in texts)):
+            return None
+        return [text.strip() for text in texts]
+
+    def _generate(self, parts, estimated_tokens, hedge=False, **kwargs):
+        """
+        Call generate_content within the client-side quota, retrying throttled
+        and transient errors with backoff. Raises the last error once retries
+        are exhausted or the error is not retryable. With hedge=True and a
+        hedge_policy set, slow attempts are hedged (see _call_hedged). With a
+        concurrency_limiter set, each attempt waits for a slot and reports
+        its latency or throttling back to the limiter.
+        """
+        response, slot = self._send(parts, estimated_tokens, hedge, **kwargs)
+        self._finish(response, slot, estimated_tokens)
+        return response
+
+    def _send(self, parts, estimated_tokens, hedge=False, **kwargs):
+        """
+        The retry loop of _generate. Returns (response, concurrency slot)
+        without releasing the slot or recording the success, so a streamed
+        response can hold both until it has been read; see _finish.
+        """
+        attempt = 0
+        while True:
+            pause = self.circuit_breaker.pause_remaining()
+            while pause > 0:
+                time.sleep(pause)
+                pause = self.circuit_breaker.pause_remaining()
+            time.sleep(self._reserve_quota(estimated_tokens))
+
+            slot = self.concurrency_limiter.acquire() if self.concurrency_limiter else None
+            try:
+                if hedge and self.hedge_policy:
+                    response = self._call_hedged(parts, estimated_tokens, **kwargs)
+                else:
+                    response = self.model.generate_content(parts, **kwargs)
+            except Exception as e:
+                if self.concurrency_limiter:
+                    self.concurrency_limiter.release(slot, succeeded=False,
+                                                     throttled=classify_error(e) == THROTTLED)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            return response, slot
+
+    def _finish(self, response, slot, estimated_tokens, succeeded=True, error=None):
+        """Release the slot taken by _send and record how the request ended"""
+        throttled = error is not None and classify_error(error) == THROTTLED
+        if self.concurrency_limiter:
+            self.concurrency_limiter.release(slot, succeeded=succeeded, throttled=throttled)
+        if succeeded:
+            self._record_success(response, estimated_tokens)
+        elif throttled:
+            self.circuit_breaker.record_throttle(retry_after_hint(error))
+
+    async def _generate_async(self, parts, estimated_tokens, hedge=False, **kwargs):
+        """
+        Async version of _generate, waiting with asyncio.sleep. Concurrency
+        here is bounded by transcribe_many_async's semaphore instead of the
+        (thread-blocking) concurrency_limiter.
+        """
+        self._use_async_client()
+        attempt = 0
+        while True:
+            pause = self.circuit_breaker.pause_remaining()
+            while pause > 0:
+                await asyncio.sleep(pause)
+                pause = self.circuit_breaker.pause_remaining()
+            await asyncio.sleep(self._reserve_quota(estimated_tokens))
+
+            try:
+                if hedge and self.hedge_policy:
+                    response = await self._call_hedged_async(parts, estimated_tokens, **kwargs)
+                else:
+                    response = await self.model.generate_content_async(parts, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            self._record_success(response, estimated_tokens)
+            return response
+
+    def _use_async_client(self):
+        # Left unset, the SDK would fall back to its process-wide client and key
+        if self._sdk_clients is not None and self.model._async_client is None:
+            self.model._async_client = self._sdk_clients.make_client('generative_async')
+
+    def _call_hedged(self, parts, estimated_tokens, **kwargs):
+        """
+        Send the request and, if it is still running after the policy's hedge
+        delay, send a duplicate and return whichever answers first. The SDK's
+        blocking call can't be interrupted, so the losing copy runs to
+        completion in the background and its answer is dropped. For streamed
+        requests the race is to the first chunk, which is when the SDK's call
+        returns; the losing stream is never read.
+
+        Until the policy has enough samples to hedge, the request simply runs
+        on the calling thread. After that the primary runs on a thread of its
+        own, so the caller is free to return the hedge's answer, and only the
+        hedge copies share the executor: it never limits how many requests
+        the callers have in flight.
+        """
+        policy = self.hedge_policy
+        policy.record_request()
+        delay = policy.hedge_delay()
+        if delay is None:
+            started = time.perf_counter()
+            response = self.model.generate_content(parts, **kwargs)
+            policy.record_result(time.perf_counter() - started)
+            return response
+
+        sent = {}
+
+        def send(submit):
+            future = submit(self.model.generate_content, parts, **kwargs)
+            sent[future] = time.perf_counter()
+            return future
+
+        primary = send(_run_in_thread)
+        pending = {primary}
+        done, _ = wait(pending, timeout=delay)
+        if not done and self._try_hedge(estimated_tokens):
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                          thread_name_prefix='gemini-hedge')
+            pending.add(send(self._hedge_executor.submit))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                for other in pending:
+                    other.cancel()
+                self._record_hedge_result(sent, future, primary)
+                return future.result()
+        raise error
+
+    async def _call_hedged_async(self, parts, estimated_tokens, **kwargs):
+        """Async version of _call_hedged; the losing copy is cancelled"""
+        policy = self.hedge_policy
+        policy.record_request()
+        sent = {}
+
+        def send():
+            task = asyncio.ensure_future(self.model.generate_content_async(parts, **kwargs))
+            sent[task] = time.perf_counter()
+            return task
+
+        primary = send()
+        pending = {primary}
+        try:
+            delay = policy.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and self._try_hedge(estimated_tokens):
+                    pending.add(send())
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    self._record_hedge_result(sent, task, primary)
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def close(self):
+        """
+        Stop the threads kept for hedged requests and close the connections
+        of a model the client built itself; the client can't be used afterwards
+        """
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False, cancel_futures=True)
+            self._hedge_executor = None
+        if self._owns_model:
+            _close_model(self.model)
+            self._owns_model = False
+
+    def _try_hedge(self, estimated_tokens):
+        # Hedges only use spare quota: never while throttled, never by waiting on the buckets
+        if self.circuit_breaker.is_open:
+            return False
+        if self.request_limiter and not self.request_limiter.try_acquire(1):
+            return False
+        if self.token_limiter and not self.token_limiter.try_acquire(estimated_tokens):
+            if self.request_limiter:
+                self.request_limiter.adjust(-1)
+            return False
+        if not self.hedge_policy.try_hedge():
+            if self.request_limiter:
+                self.request_limiter.adjust(-1)
+            if self.token_limiter:
+                self.token_limiter.adjust(-estimated_tokens)
+            return False
+        return True
+
+    def _record_hedge_result(self, sent, winner, primary):
+        latency = time.perf_counter() - sent[winner]
+        hedged = len(sent) > 1
+        hedge_won = winner is not primary
+        self.hedge_policy.record_result(latency, hedge_won)
+        if hedged:
+            metrics.record('api.hedge', time.perf_counter() - sent[primary],
+                           model=self.model_name, hedge_won=int(hedge_won))
+
+    def _reserve_quota(self, estimated_tokens):
+        wait = 0.0
+        if self.request_limiter:
+            wait = max(wait, self.request_limiter.reserve(1))
+        if self.token_limiter:
+            wait = max(wait, self.token_limiter.reserve(estimated_tokens))
+        return wait
+
+    def _retry_delay(self, error, attempt):
+        """Return seconds to back off before retrying, or None to give up"""
+        kind = classify_error(error)
+        if kind == FATAL:
+            return None
+
+        retry_after = retry_after_hint(error)
+        if kind == THROTTLED:
+            self.circuit_breaker.record_throttle(retry_after)
+        if attempt + 1 >= self.retry_policy.max_attempts:
+            return None
+
+        delay = self.retry_policy.delay(attempt, retry_after)
+        metrics.record('api.backoff', delay, kind=kind, attempt=attempt + 1, model=self.model_name)
+        return delay
+
+    def _record_success(self, response, estimated_tokens):
+        self.circuit_breaker.record_success()
+        usage = getattr(response, 'usage_metadata', None)
+        if self.token_limiter and estimated_tokens and usage is not None and usage.total_token_count:
+            # Settle the difference between the estimate and what was actually used
+            self.token_limiter.adjust(usage.total_token_count - estimated_tokens)
+
+    @staticmethod
+    def _estimate_tokens(images):
+        tokens = PROMPT_TOKENS
+        for image in images:
+            if isinstance(image, PreparedImage):
+                size = image.size
+            else:
+                with Image.open(image) as img:
+                    size = img.size
+            tokens += estimate_image_tokens(size) + EXPECTED_OUTPUT_TOKENS_PER_PAGE
+        return tokens
+
+    @staticmethod
+    def _image_part(image):
+        if isinstance(image, PreparedImage):
+            return image.to_blob()
+        # File-based path, e.g. images saved with ImageProcessor(save_processed_files=True)
+        return Image.open(image)
+
+    @staticmethod
+    def _load_file(path):
+        """
+        Read an image file as it is, without preparing it, into a PreparedImage.
+        Its cache key and upload size are the same as for the path itself.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        with Image.open(io.BytesIO(data)) as img:
+            mime_type = Image.MIME.get(img.format, 'image/jpeg')
+            size = img.size
+        return PreparedImage(data, mime_type, size, source_path=path)
+
+    def _cache_key(self, image):
+        if self.cache is None:
+            return None
+        if isinstance(image, PreparedImage):
+            image_bytes = image.data
+        else:
+            with open(image, 'rb') as f:
+                image_bytes = f.read()
+        return self.cache.make_key(image_bytes, TRANSCRIPTION_PROMPT, self.model_name)
+
+    @staticmethod
+    def _source_path(image):
+        return image.source_path if isinstance(image, PreparedImage) else image
+
+    @staticmethod
+    def _upload_size(image):
+        return len(image.data) if isinstance(image, PreparedImage) else os.path.getsize(image)
+
+    @staticmethod
+    def _usage_attrs(response):
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is None:
+            return {}
+        return {
+            'prompt_tokens': usage.prompt_token_count,
+            'output_tokens': usage.candidates_token_count,
+            'total_tokens': usage.total_token_count,
+        }
+
+    @staticmethod
+    def _chunk_text(chunk):
+        # Chunks carrying only a finish reason or usage have no text parts
+        try:
+            return chunk.text
+        except ValueError:
+            return ''
+
+    @staticmethod
+    def _response_text(response):
+        if response.text:
+            return response.text.strip()
+        else:
+            raise ValueError("No text was transcribed from the image")
@@ -0,0 +1,536 @@
+"""
+Headless batch transcription.
+
+Usage:
+    python src/batch.py uploads/ "scans/**/*.jpg" --workers 8
+    python src/batch.py uploads/ --watch
+    python src/batch.py notebook.pdf --pdf-output entry
+"""
+import argparse
+import glob
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from api_client import (DEFAULT_PACK_TOKEN_BUDGET, PACKED_TRANSCRIPTION_PROMPT, TRANSCRIPTION_PROMPT,
+                        GeminiAPIClient)
+from hedging import HedgePolicy
+from image_processor import ImageProcessor
+from journal_store import JournalStore
+from manifest import DEFAULT_MANIFEST_PATH, Manifest
+from metrics import JsonLogSink, PrometheusSink, metrics
+from pdf_source import PDF_EXTENSION, PdfPages, is_pdf, page_source
+from pipeline import (group_entries, init_prepare_worker, prepare_file, transcribe_file,
+                      transcribe_files_packed, transcribe_prepared, write_transcription)
+from rate_limiter import AdaptiveConcurrencyLimiter
+from transcript_index import DEFAULT_INDEX_PATH, TranscriptIndex
+from transcription_cache import DEFAULT_CACHE_PATH, TranscriptionCache
+
+
+def collect_image_files(inputs, supported_formats, recursive=False):
+    """
+    Expand directories and glob patterns into a sorted list of image files.
+    Intermediate *_processed files are skipped.
+    """
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            candidates = glob.glob(pattern, recursive=recursive)
+        else:
+            candidates = glob.glob(item, recursive=True)
+
+        for path in candidates:
+            name, ext = os.path.splitext(path)
+            if not os.path.isfile(path) or ext.lower() not in supported_formats:
+                continue
+            if name.endswith('_processed'):
+                continue
+            files.add(os.path.abspath(path))
+
+    return sorted(files)
+
+
+def _transcribe_group(file_paths, image_processor, api_client, pack_size, token_budget):
+    if pack_size > 1:
+        return transcribe_files_packed(file_paths, image_processor, api_client, pack_size, token_budget)
+
+    outcomes = []
+    for path in file_paths:
+        try:
+            outcomes.append((path, transcribe_file(path, image_processor, api_client)))
+        except Exception as e:
+            outcomes.append((path, e))
+    return outcomes
+
+
+class _Progress:
+    """
+    Writes outputs and logs results as files finish, for run_batch,
+    run_batch_pipelined and run_pdf. With a JournalStore, results are
+    appended to it (with model and prompt as provenance) instead of being
+    written as .txt files, and the output path is the entry's reference.
+    """
+    def __init__(self, total, output_dir, log, on_result, store=None, model=None, prompt=None):
+        self.total = total
+        self.output_dir = output_dir
+        self.log = log
+        self.on_result = on_result
+        self.store = store
+        self.model = model
+        self.prompt = prompt
+        self.done = 0
+        self.succeeded = 0
+        self.failures = []
+
+    def record(self, path, outcome):
+        self.done += 1
+        counter = f"[{self.done}/{self.total}]" if self.total else f"[{self.done}]"
+        output_path, error = None, None
+        try:
+            if isinstance(outcome, Exception):
+                raise outcome
+            if self.store:
+                output_path = self.store.entry_ref(self.store.append(outcome, self.model, self.prompt))
+            else:
+                output_path = write_transcription(outcome, self.output_dir)
+            self.succeeded += 1
+            self.log(f"{counter} {path} -> {output_path}")
+        except Exception as e:
+            error = e
+            self.failures.append((path, e))
+            self.log(f"{counter} {path} FAILED: {e}")
+        if self.on_result:
+            self.on_result(path, output_path, error)
+
+    def close(self):
+        if self.store:
+            self.store.flush()
+
+
+def run_batch(files, api_client, image_processor, workers=4, output_dir=None, log=print,
+              pack_size=1, token_budget=DEFAULT_PACK_TOKEN_BUDGET, on_result=None,
+              prepare_processes=0, store=None, prepare_pool=None):
+    """
+    Transcribe files with up to `workers` API calls in flight.
+    Each output is written as soon as its transcription finishes.
+    With pack_size > 1, each API call carries up to pack_size pages.
+    on_result(path, output_path, error) is called for every file as it
+    finishes, with output_path None on failure and error None on success.
+    With prepare_processes > 0 or a prepare_pool (see make_prepare_pool),
+    images are prepared in worker processes (see run_batch_pipelined);
+    otherwise on the API worker threads.
+    With a JournalStore, results are appended to it instead of written
+    as .txt files.
+
+    Returns:
+        tuple: (number succeeded, list of (path, error) for failures, elapsed seconds)
+    """
+    if prepare_processes or prepare_pool:
+        return run_batch_pipelined(files, api_client, image_processor, workers, output_dir, log,
+                                   pack_size, token_budget, on_result, prepare_processes, store=store,
+                                   pool=prepare_pool)
+
+    progress = _Progress(len(files), output_dir, log, on_result, store,
+                         api_client.model_name, _run_prompt(pack_size))
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_transcribe_group, files[i:i + pack_size], image_processor,
+                            api_client, pack_size, token_budget)
+            for i in range(0, len(files), pack_size)
+        ]
+        for future in as_completed(futures):
+            for path, outcome in future.result():
+                progress.record(path, outcome)
+    progress.close()
+
+    return progress.succeeded, progress.failures, time.perf_counter() - start
+
+
+def make_prepare_pool(image_processor, processes=None):
+    """
+    Process pool for run_batch_pipelined, set up like image_processor. Spans
+    recorded in the workers are sent back if this process records metrics
+    when the pool is created.
+    """
+    return ProcessPoolExecutor(max_workers=processes or os.cpu_count() or 1, initializer=init_prepare_worker,
+                               initargs=(image_processor.save_processed_files, image_processor.max_dimension,
+                                         bool(metrics.sinks)))
+
+
+def run_batch_pipelined(files, api_client, image_processor, workers=4, output_dir=None, log=print,
+                        pack_size=1, token_budget=DEFAULT_PACK_TOKEN_BUDGET, on_result=None,
+                        prepare_processes=None, queue_size=None, store=None, pool=None):
+    """
+    Two-stage version of run_batch. Images are validated and prepared in a
+    pool of prepare_processes worker processes (default: one per core) and
+    handed as encoded bytes to `workers` threads making the API calls.
+    At most queue_size prepared images (default: two rounds of API calls)
+    wait for the API stage, so preparation can run ahead of the network but
+    not fill memory. A pool from make_prepare_pool can be passed in to be
+    reused across runs; it is left open. The workers' spans are recorded
+    in this process's metrics.
+
+    Returns:
+        tuple: (number succeeded, list of (path, error) for failures, elapsed seconds)
+    """
+    prepare_processes = prepare_processes or os.cpu_count() or 1
+    queue_size = queue_size or workers * pack_size * 2
+    prepared_queue = queue.Queue(maxsize=queue_size)  # (path, PreparedImage or Exception), None when done
+    results_queue = queue.Queue()  # (path, TranscriptionResult or Exception)
+    progress = _Progress(len(files), output_dir, log, on_result, store,
+                         api_client.model_name, _run_prompt(pack_size))
+    start = time.perf_counter()
+
+    def prepare_stage(pool):
+        # Keep every process busy while preserving input order; put() blocks
+        # when the API stage falls behind, which stops new submissions too
+        pending = deque()
+        try:
+            for path in files:
+                try:
+                    pending.append((path, pool.submit(prepare_file, path)))
+                except Exception as e:  # e.g. a worker process died and broke the pool
+                    results_queue.put((path, e))
+                    continue
+                if len(pending) > prepare_processes * 2:
+                    hand_over(*pending.popleft())
+            while pending:
+                hand_over(*pending.popleft())
+        finally:
+            for _ in range(workers):
+                prepared_queue.put(None)
+
+    def hand_over(path, future):
+        try:
+            outcome, events = future.result()
+        except Exception as e:  # The worker process died
+            outcome, events = e, []
+        for event in events:
+            metrics.emit(event)
+        if isinstance(outcome, Exception):
+            results_queue.put((path, outcome))
+        else:
+            prepared_queue.put((path, outcome))
+
+    def api_stage():
+        finished = False
+        while not finished:
+            item = prepared_queue.get()
+            if item is None:
+                break
+            group = [item]
+            # Fill a pack with whatever else is already prepared
+            while len(group) < pack_size:
+                try:
+                    item = prepared_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                group.append(item)
+            for outcome in transcribe_prepared(group, api_client, pack_size, token_budget):
+                results_queue.put(outcome)
+
+    own_pool = pool is None
+    if own_pool:
+        pool = make_prepare_pool(image_processor, prepare_processes)
+    try:
+        threads = [threading.Thread(target=prepare_stage, args=(pool,), daemon=True)]
+        threads += [threading.Thread(target=api_stage, daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for _ in range(len(files)):
+            progress.record(*results_queue.get())
+        for thread in threads:
+            thread.join()
+    finally:
+        if own_pool:
+            pool.shutdown()
+    progress.close()
+
+    return progress.succeeded, progress.failures, time.perf_counter() - start
+
+
+def run_pdf(pdf_path, api_client, image_processor, workers=4, output_dir=None, log=print,
+            by_entry=False, on_result=None, store=None):
+    """
+    Transcribe a PDF one page at a time. A page is only rendered when one of
+    the `workers` API calls has room for it, so at most `workers` prepared
+    pages are in memory however long the document is. Outputs are written
+    per page, or with by_entry=True per dated entry (see group_entries),
+    or appended to a JournalStore.
+
+    Returns:
+        tuple: (number succeeded, list of (path, error) for failures, elapsed seconds)
+    """
+    start = time.perf_counter()
+    try:
+        pages = PdfPages(pdf_path, image_processor)
+    except (ImportError, OSError, ValueError) as e:
+        log(f"{pdf_path} FAILED: {e}")
+        if on_result:
+            on_result(pdf_path, None, e)
+        return 0, [(pdf_path, e)], time.perf_counter() - start
+
+    def transcribe_page(page_number, prepared):
+        # Reported as notebook.pdf#page=3, like a page that fails to render
+        _, outcome = transcribe_prepared([(pdf_path, prepared)], api_client)[0]
+        if not isinstance(outcome, Exception):
+            outcome.page = page_number
+        return page_source(pdf_path, page_number), outcome
+
+    def page_outcomes(executor):
+        # Results come back in page order, which group_entries relies on. Pages are
+        # rendered on this thread (pdfium is not thread-safe), each in its own try so
+        # a page that fails to render fails alone, in its place among the others
+        in_flight = deque()
+        for page_number in range(1, len(pages) + 1):
+            try:
+                prepared = pages.render_page(page_number)
+            except Exception as e:
+                failed = Future()
+                failed.set_result((page_source(pdf_path, page_number), e))
+                in_flight.append(failed)
+            else:
+                in_flight.append(executor.submit(transcribe_page, page_number, prepared))
+            if len(in_flight) >= workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    with pages:
+        progress = _Progress(None if by_entry else len(pages), output_dir, log, on_result, store,
+                             api_client.model_name, TRANSCRIPTION_PROMPT)
+        log(f"{pdf_path}: {len(pages)} pages")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = page_outcomes(executor)
+            for path, outcome in (group_entries(outcomes) if by_entry else outcomes):
+                progress.record(path, outcome)
+        progress.close()
+
+    return progress.succeeded, progress.failures, time.perf_counter() - start
+
+
+def index_output(index, output_path, store=None):
+    """Add an output to a TranscriptIndex: a .txt file, or an entry in the JournalStore"""
+    if store:
+        entry = store.get(store.ref_id(output_path))
+        index.add(output_path, entry.transcription, entry.date, entry.source)
+    else:
+        index.add_file(output_path)
+
+
+def _run_prompt(pack_size):
+    # Packs of one page, and packs whose response can't be split, fall back to
+    # the single-page prompt; provenance records the prompt the run asked for
+    return PACKED_TRANSCRIPTION_PROMPT if pack_size > 1 else TRANSCRIPTION_PROMPT
+
+
+def _process_count(value):
+    """argparse type of --prepare-processes: a number of processes, or 'auto' for one per core"""
+    if value == "auto":
+        return os.cpu_count() or 1
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number or 'auto', got {value!r}") from None
+    if count < 0:
+        raise argparse.ArgumentTypeError("can't be negative")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe a folder of journal images without the GUI.")
+    parser.add_argument("inputs", nargs="+", help="Image files, directories or glob patterns")
+    parser.add_argument("-j", "--workers", type=int, default=4,
+                        help="Number of concurrent API calls (default: 4)")
+    parser.add_argument("-o", "--output-dir",
+                        help="Directory for .txt outputs (default: next to each image)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Recurse into sub-directories")
+    parser.add_argument("--api-key", help="Gemini API key (default: $GEMINI_API_KEY)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help=f"Transcription cache database (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API")
+    parser.add_argument("--rpm", type=int, help="Client-side requests-per-minute limit")
+    parser.add_argument("--tpm", type=int, help="Client-side tokens-per-minute limit")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Adapt the number of concurrent API calls to latency and throttling, "
+                             "up to --workers")
+    parser.add_argument("--concurrency-history", metavar="PATH",
+                        help="With --adaptive, write the concurrency limit history as CSV")
+    parser.add_argument("--hedge-percentile", type=float, metavar="P",
+                        help="Send a duplicate of single-page requests slower than the P-th "
+                             "percentile of recent latencies (default: off)")
+    parser.add_argument("--prepare-processes", type=_process_count, default="auto", metavar="N",
+                        help="Processes preparing images ahead of the API calls, 'auto' for one per core "
+                             "or 0 to prepare on the API threads (default: auto)")
+    parser.add_argument("--pdf-output", choices=("page", "entry"), default="page",
+                        help="Write one file per PDF page, or per dated entry spanning pages (default: page)")
+    parser.add_argument("--pack-size", type=int, default=1,
+                        help="Pages sent per API request (default: 1, no packing)")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_PACK_TOKEN_BUDGET,
+                        help=f"Estimated tokens allowed per packed request (default: {DEFAULT_PACK_TOKEN_BUDGET})")
+    parser.add_argument("--metrics-log", metavar="PATH",
+                        help="Write per-stage timings as JSON lines ('-' for stderr)")
+    parser.add_argument("--prometheus", metavar="PATH",
+                        help="Write a Prometheus text-format dump of stage histograms at the end")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and transcribe new or changed images as they appear")
+    parser.add_argument("--interval", type=float, default=5.0,
+                        help="Seconds between folder scans in --watch mode (default: 5)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH,
+                        help=f"Record of processed images for --watch (default: {DEFAULT_MANIFEST_PATH})")
+    parser.add_argument("--store", metavar="PATH",
+                        help="Append entries to a journal store database instead of writing .txt files")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH,
+                        help=f"Full-text index updated with every output (default: {DEFAULT_INDEX_PATH})")
+    parser.add_argument("--no-index", action="store_true", help="Don't index the outputs")
+    parser.add_argument("--save-processed", action="store_true",
+                        help="Debug: also write <name>_processed.<ext> next to each image")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_key = args.api_key or os.environ.get("GEMINI_API_KEY")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.pack_size < 1:
+        parser.error("--pack-size must be at least 1")
+
+    image_processor = ImageProcessor(save_processed_files=args.save_processed)
+    # PDFs are transcribed page by page; watch mode only picks up images
+    formats = image_processor.supported_formats if args.watch else image_processor.supported_formats | {PDF_EXTENSION}
+    files = collect_image_files(args.inputs, formats, args.recursive)
+    if not files and not args.watch:
+        print("No image or PDF files found", file=sys.stderr)
+        return 1
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    cache = None if args.no_cache else TranscriptionCache(args.cache)
+    try:
+        concurrency_limiter = None
+        if args.adaptive:
+            concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=min(4, args.workers),
+                                                             max_limit=args.workers)
+        hedge_policy = HedgePolicy(percentile=args.hedge_percentile) if args.hedge_percentile else None
+        api_client = GeminiAPIClient(api_key=api_key, max_concurrency=args.workers, cache=cache,
+                                     requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                                     hedge_policy=hedge_policy, concurrency_limiter=concurrency_limiter)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    metrics_log = None
+    if args.metrics_log:
+        metrics_log = sys.stderr if args.metrics_log == '-' else open(args.metrics_log, 'a')
+        metrics.add_sink(JsonLogSink(metrics_log))
+    prometheus = None
+    if args.prometheus:
+        prometheus = PrometheusSink()
+        metrics.add_sink(prometheus)
+
+    store = JournalStore(args.store) if args.store else None
+    index = None if args.no_index else TranscriptIndex(args.index)
+
+    def on_result(path, output_path, error):
+        if output_path:
+            index_output(index, output_path, store)
+
+    if args.watch:
+        # watcher imports this module, so it can't be imported at the top
+        from watcher import FolderWatcher
+
+        manifest = Manifest(args.manifest)
+        watcher = FolderWatcher(args.inputs, api_client, image_processor, manifest, args.output_dir,
+                                args.recursive, args.workers, args.pack_size, args.token_budget,
+                                prepare_processes=args.prepare_processes, index=index, store=store)
+        print(f"Watching {', '.join(args.inputs)} every {args.interval:g}s (Ctrl+C to stop)")
+        start = time.perf_counter()
+        try:
+            watcher.run(args.interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            manifest.close()
+        succeeded, failures = watcher.succeeded, watcher.failures
+        total, elapsed = succeeded + len(failures), time.perf_counter() - start
+    else:
+        images = [path for path in files if not is_pdf(path)]
+        pdfs = [path for path in files if is_pdf(path)]
+        documents = f" and {len(pdfs)} PDFs" if pdfs else ""
+        if concurrency_limiter:
+            print(f"Transcribing {len(images)} images{documents} with up to {args.workers} workers "
+                  f"(adaptive, starting at {concurrency_limiter.limit})")
+        else:
+            print(f"Transcribing {len(images)} images{documents} with {args.workers} workers")
+
+        succeeded, failures, elapsed = 0, [], 0.0
+        if images:
+            succeeded, failures, elapsed = run_batch(images, api_client, image_processor,
+                                                     args.workers, args.output_dir,
+                                                     pack_size=args.pack_size, token_budget=args.token_budget,
+                                                     on_result=on_result if index else None,
+                                                     prepare_processes=args.prepare_processes, store=store)
+        for pdf_path in pdfs:
+            pdf_succeeded, pdf_failures, pdf_elapsed = run_pdf(pdf_path, api_client, image_processor,
+                                                               args.workers, args.output_dir,
+                                                               by_entry=args.pdf_output == "entry",
+                                                               on_result=on_result if index else None,
+                                                               store=store)
+            succeeded += pdf_succeeded
+            failures += pdf_failures
+            elapsed += pdf_elapsed
+        total = succeeded + len(failures)
+
+    throughput = total / elapsed if elapsed else 0.0
+    print(f"Done: {succeeded} succeeded, {len(failures)} failed "
+          f"in {elapsed:.1f}s ({throughput:.2f} images/sec)")
+    if prometheus:
+        prometheus.write(args.prometheus)
+    if metrics_log and metrics_log is not sys.stderr:
+        metrics_log.close()
+    api_client.close()
+    if api_client.circuit_breaker.trips:
+        print(f"Throttled: paused all workers {api_client.circuit_breaker.trips} times")
+    if concurrency_limiter:
+        history = concurrency_limiter.history()
+        limits = [limit for _, limit in history]
+        print(f"Concurrency: final limit {concurrency_limiter.limit} "
+              f"(ranged {min(limits)}-{max(limits)}, {len(history) - 1} changes)")
+        if args.concurrency_history:
+            with open(args.concurrency_history, 'w') as f:
+                f.write("timestamp,limit\n")
+                f.writelines(f"{timestamp:.3f},{limit}\n" for timestamp, limit in history)
+    if hedge_policy:
+        stats = hedge_policy.stats()
+        print(f"Hedging: {stats['hedges']} of {stats['requests']} requests hedged, "
+              f"{stats['wins']} won by the hedge")
+    if cache:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses")
+        cache.close()
+    if store:
+        stats = store.stats()
+        print(f"Store: {stats['entries']} entries on {stats['dates']} dates in {store.path}")
+        store.close()
+    if index:
+        stats = index.stats()
+        print(f"Index: {stats['documents']} transcriptions in {index.path}")
+        index.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Headless entry point: everything but the GUI, without importing tkinter.
+
+Usage:
+    python src/cli.py batch uploads/ --workers 8
+    python src/cli.py serve --port 5000
+    python src/cli.py index search alice --from 2021-01-01
+    python src/cli.py journal export journal/
+
+Each command imports only the modules it needs, when it runs, so e.g.
+searching the index never loads the Gemini SDK.
+"""
+import argparse
+import importlib
+import sys
+
+# command -> (module, help); the module's main(argv) handles the remaining arguments
+COMMANDS = {
+    'batch': ('batch', "Transcribe images and PDFs, or watch folders"),
+    'index': ('transcript_index', "Update and search the full-text index"),
+    'journal': ('journal_store', "List and export the journal store"),
+}
+
+
+def _serve(argv):
+    parser = argparse.ArgumentParser(prog="cli.py serve", description="Run the HTTP transcription service.")
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=5000, help="Port to listen on (default: 5000)")
+    args = parser.parse_args(argv)
+
+    from main import serve
+    serve(args.host, args.port)
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(description="Journal transcriber without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, (_, description) in COMMANDS.items():
+        commands.add_parser(name, help=description, add_help=False)
+    commands.add_parser("serve", help="Run the HTTP transcription service", add_help=False)
+
+    # Only the command is parsed here; its own parser gets the rest, including --help
+    args, rest = parser.parse_known_args(argv[:1])
+    rest += argv[1:]
+    if args.command == "serve":
+        return _serve(rest)
+    module = importlib.import_module(COMMANDS[args.command][0])
+    return module.main(rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,178 @@
 import re
-from datetime import datetime
+from collections import namedtuple
+from metrics import metrics
+
+MONTH_NUMBERS = {
+    'january': 1, 'jan': 1,
+    'february': 2, 'feb': 2,
+    'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4,
+    'may': 5,
+    'june': 6, 'jun': 6,
+    'july': 7, 'jul': 7,
+    'august': 8, 'aug': 8,
+    'september': 9, 'sept': 9, 'sep': 9,
+    'october': 10, 'oct': 10,
+    'november': 11, 'nov': 11,
+    'december': 12, 'dec': 12,
+}
+
+_DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# All supported formats in one alternation, scanned in a single pass.
+# Month names are matched as any 3-9 letter word and checked against
+# MONTH_NUMBERS afterwards, which is much cheaper than a 20-way alternation.
+# Every part has a bounded length, so a match never spans more than
+# _MAX_DATE_LENGTH characters.
+_DATE_RE = re.compile(r"""
+    (?<!\w)(?:
+        (?P<ymd_y>\d{4})[/-](?P<ymd_m>\d{1,2})[/-](?P<ymd_d>\d{1,2})                  # YYYY-MM-DD
+      | (?P<dmy_d>\d{1,2})[/-](?P<dmy_m>\d{1,2})[/-](?P<dmy_y>\d{4})                  # DD-MM-YYYY
+      | (?P<mdy_m>[A-Za-z]{3,9}+)\.?\s{1,5}(?P<mdy_d>\d{1,2})(?:st|nd|rd|th)?,?\s{1,5}(?P<mdy_y>\d{4})  # Month DD, YYYY
+    )\b
+""", re.VERBOSE)
+
+DateCandidate = namedtuple('DateCandidate', ['date', 'start', 'end', 'priority'])
+
+
+def _format_date(year, month, day):
+    """Return YYYY-MM-DD, or None if the date does not exist"""
+    if not 1 <= month <= 12 or not 1 <= day <= _DAYS_IN_MONTH[month]:
+        return None
+    if month == 2 and day == 29 and not (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def _candidate_date(match):
+    """
+    Return (date string or None, priority) for a match. A lower priority wins
+    when a text holds several dates, following the original pattern order.
+    """
+    if match.group('ymd_y'):
+        return _format_date(int(match.group('ymd_y')), int(match.group('ymd_m')), int(match.group('ymd_d'))), 0
+
+    if match.group('dmy_d'):
+        first, second = int(match.group('dmy_d')), int(match.group('dmy_m'))
+        year = int(match.group('dmy_y'))
+        # DD-MM-YYYY, falling back to MM-DD-YYYY when that is the only valid reading
+        return _format_date(year, second, first) or _format_date(year, first, second), 1
+
+    month = MONTH_NUMBERS.get(match.group('mdy_m').lower())
+    if month is None:
+        return None, 2
+    return _format_date(int(match.group('mdy_y')), month, int(match.group('mdy_d'))), 2
+
+
+def _best_candidate(candidates):
+    # YYYY-MM-DD beats DD-MM-YYYY beats month names; ties go to the earliest
+    return min(candidates, key=lambda c: (c.priority, c.start))
+
+
+def find_dates(text):
+    """
+    Find every valid date in text in a single regex pass.
+
+    Returns:
+        list[DateCandidate]: Dates as YYYY-MM-DD with their positions, in text order
+    """
+    candidates = []
+    for match in _DATE_RE.finditer(text):
+        date_str, priority = _candidate_date(match)
+        if date_str:
+            candidates.append(DateCandidate(date_str, match.start(), match.end(), priority))
+    return candidates
+
 
 def extract_date(text):
     """
     Extract and validate date from transcribed text.
     Returns standardized date string in YYYY-MM-DD format.
     """
-    # Common date patterns
-    date_patterns = [
-        r'\b(\d{4})[/-](\d{1,2})[/-](\d{1,2})\b',  # YYYY-MM-DD
-        r'\b(\d{1,2})[/-](\d{1,2})[/-](\d{4})\b',  # DD-MM-YYYY
-        r'\b(\w+)\s+(\d{1,2}),?\s+(\d{4})\b',      # Month DD, YYYY
-    ]
-    
-    for pattern in date_patterns:
-        matches = re.findall(pattern, text)
-        if matches:
-            for match in matches:
-                try:
-                    # Convert month name to number if necessary
-                    if len(match[0]) > 2:  # Likely a month name
-                        date_obj = datetime.strptime(f"{match[0]} {match[1]} {match[2]}", "%B %d %Y")
-                    else:
-                        # Assume YYYY-MM-DD format
-                        date_obj = datetime.strptime(f"{match[0]}-{match[1]}-{match[2]}", "%Y-%m-%d")
-                    
-                    return date_obj.strftime("%Y-%m-%d")
-                except ValueError:
-                    continue
-    
-    raise ValueError("No valid date found in the transcribed text")
+    with metrics.span('extract_date', text_length=len(text)) as span:
+        candidates = find_dates(text)
+        span.set(candidates=len(candidates))
+        if not candidates:
+            raise ValueError("No valid date found in the transcribed text")
+
+        return _best_candidate(candidates).date
+
+
+def extract_dates_batch(texts):
+    """
+    Extract dates from many texts, e.g. when re-indexing existing .txt outputs.
+
+    Returns:
+        list: YYYY-MM-DD string for each text, or None where no date was found
+    """
+    results = []
+    for text in texts:
+        candidates = find_dates(text)
+        results.append(_best_candidate(candidates).date if candidates else None)
+    return results
+
+
+# Longest text a single _DATE_RE match can span: a 9-letter month, ".", up to
+# 5 spaces, "30th,", up to 5 spaces and the year. Numeric dates are at most 10.
+_MAX_DATE_LENGTH = len("September.") + 5 + len("30th,") + 5 + len("2021")
+
+
+class IncrementalDateExtractor:
+    """
+    Date detection for a transcription that arrives in chunks.
+
+    date is the best date in the text fed so far, ranked as in extract_date,
+    so a journal entry's filename is usually known once its first line is
+    in. A match that touches the end of the text is held back until more
+    text arrives (or finish() is called), since "2021-05-1" may still
+    become "2021-05-12". Each feed() only rescans the new tail of the text.
+    """
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+        self._tail = ''  # The last _MAX_DATE_LENGTH characters before the unscanned text
+        self._pending = ''  # Text not yet fully scanned
+        self._candidates = []
+
+    @property
+    def text(self):
+        return ''.join(self._parts)
+
+    @property
+    def date(self):
+        return _best_candidate(self._candidates).date if self._candidates else None
+
+    def feed(self, chunk):
+        """Add a chunk of text and return the best date found so far, or None"""
+        self._parts.append(chunk)
+        self._pending += chunk
+        self._scan(final=False)
+        return self.date
+
+    def finish(self):
+        """Scan the end of the text; the result matches extract_date on the full text"""
+        self._scan(final=True)
+        return self.date
+
+    def _scan(self, final):
+        window = self._tail + self._pending
+        offset = self._length - len(self._tail)  # Position of window[0] in the full text
+        scanned_to = len(window)
+        last_end = len(self._tail)
+        for match in _DATE_RE.finditer(window, len(self._tail)):
+            if not final and match.end() >= len(window):
+                scanned_to = match.start()
+                break
+            last_end = match.end()
+            date_str, priority = _candidate_date(match)
+            if date_str:
+                self._candidates.append(
+                    DateCandidate(date_str, offset + match.start(), offset + match.end(), priority))
+
+        if not final:
+            # Keep anything a later chunk could still complete into a date,
+            # but never rescan a match that was already recorded
+            scanned_to = max(last_end, min(scanned_to, len(window) - _MAX_DATE_LENGTH))
+        self._length += scanned_to - len(self._tail)
+        self._tail = window[max(0, scanned_to - _MAX_DATE_LENGTH):scanned_to]
+        self._pending = window[scanned_to:]
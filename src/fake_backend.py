@@ -0,0 +1,192 @@
+"""
+Local stand-in for genai.GenerativeModel, for load tests and offline runs.
+
+    client = GeminiAPIClient(model=FakeGeminiModel(latency='lognormal:1.2,0.4', throttle_rate=0.02))
+
+Responses come from canned transcripts after a simulated delay, and
+configurable shares of requests fail with 429s or 5xx errors, raised as the
+same google.api_core exceptions the real SDK raises.
+"""
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+
+from rate_limiter import TokenBucket
+
+DEFAULT_TRANSCRIPTS = (
+    "March 3, 2021\n\nWent for a long walk in the park this morning. The rain held off until noon.",
+    "2021-04-17\n\nDinner with friends. We talked about plans for the summer and stayed up late.",
+    "12/05/2021\n\nTired today. Wrote three letters and read a few chapters before bed.",
+    "Sunday\n\nNo date on this page, just notes about the garden and what to plant next spring.",
+)
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 258  # Tokens Gemini counts per image tile
+
+
+def parse_latency(spec):
+    """
+    Build a latency sampler from a spec string:
+
+        const:S              always S seconds
+        uniform:A,B          uniformly between A and B
+        exp:MEAN             exponential with the given mean
+        lognormal:MEDIAN,SIGMA  log-normal, the usual shape of API latencies
+
+    Returns:
+        function: rng -> seconds
+    """
+    kind, _, args = spec.partition(':')
+    try:
+        values = [float(value) for value in args.split(',')] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec: {spec}") from None
+
+    samplers = {
+        ('const', 1): lambda rng: values[0],
+        ('uniform', 2): lambda rng: rng.uniform(values[0], values[1]),
+        ('exp', 1): lambda rng: rng.expovariate(1 / values[0]),
+        ('lognormal', 2): lambda rng: rng.lognormvariate(math.log(values[0]), values[1]),
+    }
+    sampler = samplers.get((kind, len(values)))
+    if sampler is None:
+        raise ValueError(f"Invalid latency spec: {spec}")
+    return sampler
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeStream:
+    """
+    FakeResponse chunks, carrying usage_metadata like the SDK's streamed
+    response; iterate it with for, or with async for if it came from
+    generate_content_async.
+    """
+    def __init__(self, text, duration, chunks, usage):
+        size = max(1, math.ceil(len(text) / chunks))
+        self.pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        self.duration = duration
+        self.usage_metadata = usage
+
+    def __iter__(self):
+        for index, piece in enumerate(self.pieces):
+            if index:
+                time.sleep(self.duration / max(1, len(self.pieces) - 1))
+            yield FakeResponse(piece)
+
+    async def __aiter__(self):
+        for index, piece in enumerate(self.pieces):
+            if index:
+                await asyncio.sleep(self.duration / max(1, len(self.pieces) - 1))
+            yield FakeResponse(piece)
+
+
+class FakeGeminiModel:
+    """
+    Drop-in for genai.GenerativeModel's generate_content and
+    generate_content_async calls, streaming (stream=True) or not.
+
+    Each request waits a latency drawn from `latency` (a parse_latency spec),
+    then fails with a 429 (throttle_rate), a 503 (error_rate), or answers
+    with the next canned transcript. With requests_per_minute set, requests
+    beyond that quota also get 429s, like a real per-project limit. Streams
+    deliver the first chunk after first_chunk_fraction of the latency and
+    the rest spread over the remainder. Packed requests (JSON responses)
+    get one transcript per image. Thread-safe; counts are kept in `stats`.
+    """
+    def __init__(self, latency='lognormal:1.0,0.4', throttle_rate=0.0, error_rate=0.0,
+                 requests_per_minute=None, transcripts=DEFAULT_TRANSCRIPTS, first_chunk_fraction=0.3,
+                 stream_chunks=8, seed=None):
+        self.sample_latency = parse_latency(latency)
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.quota = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.transcripts = list(transcripts)
+        self.first_chunk_fraction = first_chunk_fraction
+        self.stream_chunks = stream_chunks
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0}
+        self._rng = random.Random(seed)
+        self._next_transcript = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, stream=False, generation_config=None, **kwargs):
+        latency, failure, texts = self._plan(contents)
+        if stream:
+            return self._stream(latency, failure, contents, texts[0])
+        time.sleep(latency)
+        if failure:
+            raise failure
+        return self._response(contents, texts, generation_config)
+
+    async def generate_content_async(self, contents, stream=False, generation_config=None, **kwargs):
+        latency, failure, texts = self._plan(contents)
+        if stream:
+            await asyncio.sleep(latency * self.first_chunk_fraction)
+            if failure:
+                raise failure
+            return self._stream_response(latency, contents, texts[0])
+        await asyncio.sleep(latency)
+        if failure:
+            raise failure
+        return self._response(contents, texts, generation_config)
+
+    def _plan(self, contents):
+        """Decide latency, outcome and transcripts for one request"""
+        from google.api_core import exceptions as google_exceptions
+
+        pages = max(1, sum(1 for part in contents if not isinstance(part, str)))
+        with self._lock:
+            self.stats['requests'] += 1
+            latency = max(0.0, self.sample_latency(self._rng))
+            roll = self._rng.random()
+            failure = None
+            if (self.quota and not self.quota.try_acquire()) or roll < self.throttle_rate:
+                self.stats['throttled'] += 1
+                # Throttled requests are rejected quickly, as the real endpoint does
+                latency = min(latency, 0.05)
+                failure = google_exceptions.ResourceExhausted("429 Quota exceeded (fake backend)")
+            elif roll < self.throttle_rate + self.error_rate:
+                self.stats['errors'] += 1
+                failure = google_exceptions.ServiceUnavailable("503 Service unavailable (fake backend)")
+            texts = []
+            for _ in range(pages):
+                texts.append(self.transcripts[self._next_transcript % len(self.transcripts)])
+                self._next_transcript += 1
+        return latency, failure, texts
+
+    def _response(self, contents, texts, generation_config):
+        json_response = (generation_config or {}).get('response_mime_type') == 'application/json'
+        text = json.dumps(texts) if json_response else texts[0]
+        return FakeResponse(text, self._usage(contents, text))
+
+    @staticmethod
+    def _usage(contents, text):
+        # Roughly how Gemini counts: a flat rate per image plus the prompt text
+        prompt_tokens = sum(len(part) // CHARS_PER_TOKEN if isinstance(part, str) else IMAGE_TOKENS
+                            for part in contents)
+        return _Usage(prompt_tokens, len(text) // CHARS_PER_TOKEN)
+
+    def _stream(self, latency, failure, contents, text):
+        # Like the SDK, the call returns once the first chunk is ready
+        time.sleep(latency * self.first_chunk_fraction)
+        if failure:
+            raise failure
+        return self._stream_response(latency, contents, text)
+
+    def _stream_response(self, latency, contents, text):
+        return FakeStream(text, latency * (1 - self.first_chunk_fraction), self.stream_chunks,
+                          self._usage(contents, text))
+
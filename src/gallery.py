@@ -0,0 +1,181 @@
+import math
+import os
+import queue
+import tkinter as tk
+from tkinter import ttk
+
+from PIL import ImageTk
+
+from thumbnail_cache import ThumbnailLoader
+
+CELL_PADDING = 8
+LABEL_HEIGHT = 18
+OVERSCAN_ROWS = 1  # Rows loaded beyond the visible ones, so slow scrolling finds them ready
+
+
+def list_images(folder, supported_formats):
+    """Sorted paths of the images directly in folder, skipping intermediate *_processed files"""
+    paths = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            if ext.lower() in supported_formats and not stem.endswith('_processed') and entry.is_file():
+                paths.append(entry.path)
+    paths.sort()
+    return paths
+
+
+class FolderGallery:
+    """
+    Window showing the images of a folder as a grid of thumbnails.
+
+    The grid is virtual: the canvas scroll region covers every row, but
+    canvas items and PhotoImages only exist for the rows on screen (plus
+    OVERSCAN_ROWS), and only their thumbnails are requested from the
+    ThumbnailLoader. Thumbnails are generated on the loader's threads and
+    handed back to the Tk thread through a queue polled with after().
+    Clicking a thumbnail calls on_select(path).
+    """
+    def __init__(self, parent, folder, supported_formats, thumbnail_cache, on_select):
+        self.folder = folder
+        self.thumbnail_cache = thumbnail_cache
+        self.on_select = on_select
+        self.paths = list_images(folder, supported_formats)
+        self.index_of = {path: index for index, path in enumerate(self.paths)}
+
+        thumb_width, thumb_height = thumbnail_cache.size
+        self.cell_width = thumb_width + 2 * CELL_PADDING
+        self.cell_height = thumb_height + 2 * CELL_PADDING + LABEL_HEIGHT
+        self.columns = 1
+        self.cells = {}  # index -> (image item, label item, PhotoImage; None until loaded, False if unreadable)
+        self.ready = queue.Queue()
+        self.loader = ThumbnailLoader(thumbnail_cache, lambda path, img: self.ready.put((path, img)))
+        self._refresh_scheduled = False
+        self._closed = False
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"{folder} ({len(self.paths)} images)")
+        self.window.geometry("760x560")
+        self.canvas = tk.Canvas(self.window, highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self.window, command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        self.scrollbar.pack(side='right', fill='y')
+        self.canvas.pack(side='left', fill='both', expand=True)
+
+        # Also destroyed with the main window, without close() being called
+        self.canvas.bind('<Destroy>', self._on_destroy)
+        self.canvas.bind('<Configure>', self._on_resize)
+        self.canvas.bind('<Button-1>', self._on_click)
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.canvas.bind(sequence, self._on_wheel)
+        self.window.protocol('WM_DELETE_WINDOW', self.close)
+        self.window.after(50, self._poll_ready)
+
+    def close(self):
+        self._closed = True
+        self.loader.close()
+        self.window.destroy()
+
+    def _on_destroy(self, event):
+        self._closed = True
+        self.loader.close()
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._schedule_refresh()
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.canvas.yview_scroll(-1, 'units')
+        else:
+            self.canvas.yview_scroll(1, 'units')
+
+    def _on_resize(self, event):
+        columns = max(1, event.width // self.cell_width)
+        if columns != self.columns:
+            # Every cell moves; rebuild the visible ones at their new positions
+            self.columns = columns
+            for index in list(self.cells):
+                self._drop_cell(index)
+            rows = math.ceil(len(self.paths) / columns)
+            self.canvas.configure(scrollregion=(0, 0, columns * self.cell_width, rows * self.cell_height),
+                                  yscrollincrement=self.cell_height // 4)
+        self._schedule_refresh()
+
+    def _on_click(self, event):
+        column = int(self.canvas.canvasx(event.x) // self.cell_width)
+        row = int(self.canvas.canvasy(event.y) // self.cell_height)
+        index = row * self.columns + column
+        if column < self.columns and 0 <= index < len(self.paths):
+            self.on_select(self.paths[index])
+
+    def _schedule_refresh(self):
+        # Scrolling fires many events per frame; refresh once they settle
+        if not self._refresh_scheduled:
+            self._refresh_scheduled = True
+            self.window.after_idle(self._refresh)
+
+    def _visible_range(self):
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first_row = max(0, int(top // self.cell_height) - OVERSCAN_ROWS)
+        last_row = int(bottom // self.cell_height) + OVERSCAN_ROWS
+        return range(first_row * self.columns, min(len(self.paths), (last_row + 1) * self.columns))
+
+    def _refresh(self):
+        self._refresh_scheduled = False
+        if self._closed:
+            return
+        visible = self._visible_range()
+        for index in [index for index in self.cells if index not in visible]:
+            self._drop_cell(index)
+
+        to_load = []
+        for index in visible:
+            if index not in self.cells:
+                self._create_cell(index)
+            if self.cells[index][2] is None:
+                img = self.thumbnail_cache.peek(self.paths[index])
+                if img is not None:
+                    self._show_thumbnail(index, img)
+                else:
+                    to_load.append(self.paths[index])
+        self.loader.request(to_load)
+
+    def _create_cell(self, index):
+        row, column = divmod(index, self.columns)
+        x = column * self.cell_width + self.cell_width // 2
+        y = row * self.cell_height + CELL_PADDING
+        image_item = self.canvas.create_image(x, y + self.thumbnail_cache.size[1] // 2, anchor='center')
+        name = os.path.basename(self.paths[index])
+        label_item = self.canvas.create_text(x, y + self.thumbnail_cache.size[1] + CELL_PADDING,
+                                             text=name if len(name) <= 20 else name[:17] + '...',
+                                             anchor='n', fill='gray')
+        self.cells[index] = (image_item, label_item, None)
+
+    def _drop_cell(self, index):
+        image_item, label_item, _ = self.cells.pop(index)
+        self.canvas.delete(image_item, label_item)
+
+    def _show_thumbnail(self, index, img):
+        image_item, label_item, _ = self.cells[index]
+        photo = ImageTk.PhotoImage(img)
+        self.canvas.itemconfigure(image_item, image=photo)
+        self.cells[index] = (image_item, label_item, photo)
+
+    def _poll_ready(self):
+        if self._closed:
+            return
+        try:
+            while True:
+                path, img = self.ready.get_nowait()
+                index = self.index_of[path]
+                if index not in self.cells or self.cells[index][2] is not None:
+                    continue
+                if img is None:
+                    self.cells[index] = self.cells[index][:2] + (False,)
+                else:
+                    self._show_thumbnail(index, img)
+        except queue.Empty:
+            pass
+        self.window.after(50, self._poll_ready)
@@ -1,13 +1,23 @@
+import itertools
 import os
+import queue
+import sqlite3
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
-from PIL import Image, ImageTk
-from api_client import GeminiAPIClient
+from api_client import TRANSCRIPTION_PROMPT, GeminiAPIClient
+from hedging import HedgePolicy
 from image_processor import ImageProcessor
-from date_extractor import extract_date
+from journal_store import JournalStore
+from transcription_cache import TranscriptionCache
+from transcript_index import TranscriptIndex
+from pipeline import TranscriptionStream, write_transcription
+from thumbnail_cache import ThumbnailCache
 from utils import validate_image_file
 import sv_ttk
 
+MAX_WORKERS = 4  # Files transcribed at once, further bounded by the client's max_concurrency
+
 class JournalTranscriberApp:
     def __init__(self):
         # Initialize the main window
@@ -21,9 +31,28 @@ class JournalTranscriberApp:
         self.api_key = ""
         self.api_client = None
         self.image_processor = ImageProcessor()
+        self.transcription_cache = TranscriptionCache()
+        self.transcript_index = TranscriptIndex()
+        self.journal_store = JournalStore()
+        self.current_image = None  # ImageHandle for the selected file
+        self.thumbnail_cache = None  # Created when the first folder is opened
+
+        # Transcriptions run on background workers so the window stays responsive.
+        # Jobs go in through job_queue; results come back through event_queue,
+        # which the Tk thread polls with after(). Workers are started when the
+        # API client is created, as many as it allows requests at once.
+        self.job_queue = queue.Queue()
+        self.event_queue = queue.Queue()
+        self.pending_jobs = 0
+        self.workers = []
+        self.job_ids = itertools.count(1)
+        # Chunks of each job in progress; the output shows one job's stream at a time
+        self.streams = {}
+        self.displayed_job = None
 
         self._create_widgets()
         self._setup_layout()
+        self.root.after(100, self._poll_events)
 
     def _create_widgets(self):
         # API Key entry frame
@@ -37,11 +66,18 @@ class JournalTranscriberApp:
         self.file_path_var = tk.StringVar()
         self.file_path_entry = ttk.Entry(self.file_frame, textvariable=self.file_path_var, width=50)
         self.browse_button = ttk.Button(self.file_frame, text="Browse", command=self._browse_file)
+        self.folder_button = ttk.Button(self.file_frame, text="Open Folder", command=self._open_folder)
 
         # Preview frame
         self.preview_frame = ttk.LabelFrame(self.root, text="Image Preview")
         self.preview_label = ttk.Label(self.preview_frame)
 
+        # Transcription frame, filled in live as the model streams its output
+        self.output_frame = ttk.LabelFrame(self.root, text="Transcription")
+        self.output_text = tk.Text(self.output_frame, height=8, wrap='word', state='disabled')
+        self.output_scrollbar = ttk.Scrollbar(self.output_frame, command=self.output_text.yview)
+        self.output_text.configure(yscrollcommand=self.output_scrollbar.set)
+
         # Progress frame
         self.progress_frame = ttk.LabelFrame(self.root, text="Progress")
         self.progress_var = tk.StringVar(value="Ready")
@@ -65,11 +101,17 @@ class JournalTranscriberApp:
         self.file_frame.pack(fill='x', padx=10, pady=5)
         self.file_path_entry.pack(side='left', padx=5, pady=5)
         self.browse_button.pack(side='left', padx=5, pady=5)
+        self.folder_button.pack(side='left', padx=5, pady=5)
 
         # Preview layout
         self.preview_frame.pack(fill='both', expand=True, padx=10, pady=5)
         self.preview_label.pack(padx=5, pady=5)
 
+        # Transcription layout
+        self.output_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        self.output_scrollbar.pack(side='right', fill='y')
+        self.output_text.pack(side='left', fill='both', expand=True, padx=5, pady=5)
+
         # Progress layout
         self.progress_frame.pack(fill='x', padx=10, pady=5)
         self.progress_label.pack(padx=5, pady=2)
@@ -85,7 +127,10 @@ class JournalTranscriberApp:
         self.api_key = self.api_key_var.get()
         if self.api_key:
             try:
-                self.api_client = GeminiAPIClient(api_key=self.api_key)
+                # Hedge slow requests: the user is waiting on each one
+                self.api_client = GeminiAPIClient(api_key=self.api_key, cache=self.transcription_cache,
+                                                  hedge_policy=HedgePolicy())
+                self._start_workers(min(MAX_WORKERS, self.api_client.max_concurrency))
                 messagebox.showinfo("API Key Set", "Gemini API key has been set.")
                 self.transcribe_button.state(['!disabled'])
             except ValueError as e:
@@ -99,18 +144,36 @@ class JournalTranscriberApp:
         )
 
         if file_path:
-            try:
-                validate_image_file(file_path)
-                self.file_path_var.set(file_path)
-                self._update_preview(file_path)
-            except ValueError as e:
-                messagebox.showerror("Error", str(e))
+            self._select_file(file_path)
+
+    def _open_folder(self):
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        from gallery import FolderGallery  # Loads PIL.ImageTk
+
+        if self.thumbnail_cache is None:
+            self.thumbnail_cache = ThumbnailCache()
+        try:
+            FolderGallery(self.root, folder, self.image_processor.supported_formats,
+                          self.thumbnail_cache, self._select_file)
+        except OSError as e:
+            messagebox.showerror("Error", str(e))
+
+    def _select_file(self, file_path):
+        try:
+            self.current_image = validate_image_file(file_path)
+            self.file_path_var.set(file_path)
+            self._update_preview(self.current_image)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+
+    def _update_preview(self, image_handle):
+        # Imported on first use, so the window can appear before PIL's Tk bindings load
+        from PIL import ImageTk
 
-    def _update_preview(self, file_path):
-        image = Image.open(file_path)
         display_size = (300, 300)
-        image.thumbnail(display_size, Image.Resampling.LANCZOS)
-        photo = ImageTk.PhotoImage(image)
+        photo = ImageTk.PhotoImage(image_handle.thumbnail(display_size))
 
         self.preview_label.configure(image=photo)
         self.preview_label.image = photo
@@ -125,40 +188,138 @@ class JournalTranscriberApp:
             messagebox.showerror("Error", "Please select an image file first")
             return
 
-        self.progress_bar.start()
-        self.progress_var.set("Processing image...")
-        self.transcribe_button.state(['disabled'])
-
         try:
-            processed_image = self.image_processor.prepare_image(file_path)
-            transcription = self.api_client.transcribe_image(processed_image)
+            # Reuse the already decoded image unless the path was edited by hand
+            image = self.current_image
+            if image is None or image.path != file_path:
+                image = validate_image_file(file_path)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
 
+        self.job_queue.put((next(self.job_ids), image, self.api_client))
+        self.pending_jobs += 1
+        if self.pending_jobs == 1:
+            self.progress_bar.start()
+        self.progress_var.set(f"Queued {os.path.basename(file_path)} ({self.pending_jobs} in progress)")
+
+    def _start_workers(self, count):
+        while len(self.workers) < count:
+            worker = threading.Thread(target=self._transcription_worker, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _transcription_worker(self):
+        """
+        Runs on a worker thread. Never touches Tk widgets; everything
+        is reported back through event_queue.
+        """
+        while True:
+            job_id, image, api_client = self.job_queue.get()
+            self.event_queue.put(('started', job_id, image.path, None))
             try:
-                date_str = extract_date(transcription)
-                output_filename = f"{date_str}.txt"
-            except ValueError:
-                self.progress_var.set("No date found in transcription. Waiting for filename...")
-                output_filename = self._prompt_for_filename()
-                if not output_filename:
-                    self.progress_var.set("Transcription completed but not saved (no filename provided)")
-                    messagebox.showinfo("Transcription Complete",
-                                        "Transcription completed but not saved as no filename was provided.")
-                    return
-
-            output_path = os.path.join(os.path.dirname(file_path), output_filename)
-            with open(output_path, 'w') as f:
-                f.write(transcription)
-
-            self.progress_var.set(f"Transcription saved to: {output_filename}")
-            messagebox.showinfo("Success", f"Transcription completed and saved to {output_filename}")
-
-        except Exception as e:
-            self.progress_var.set("Error occurred during transcription")
+                stream = TranscriptionStream(image, self.image_processor, api_client)
+                date_str = None
+                for chunk in stream:
+                    self.event_queue.put(('chunk', job_id, image.path, chunk))
+                    if stream.date_str != date_str:
+                        date_str = stream.date_str
+                        self.event_queue.put(('date', job_id, image.path, date_str))
+                self.event_queue.put(('done', job_id, image.path, stream.result))
+            except Exception as e:
+                self.event_queue.put(('error', job_id, image.path, e))
+
+    def _poll_events(self):
+        try:
+            while True:
+                kind, job_id, file_path, payload = self.event_queue.get_nowait()
+                name = os.path.basename(file_path)
+                if kind == 'started':
+                    self.streams[job_id] = []
+                    self.progress_var.set(f"Processing {name}... ({self.pending_jobs} in progress)")
+                    continue
+                if kind == 'chunk':
+                    self.streams[job_id].append(payload)
+                    if self.displayed_job is None:
+                        # Nothing streaming on screen (or the last one finished): follow this job
+                        self.displayed_job = job_id
+                        self._set_output_text(''.join(self.streams[job_id]))
+                    elif self.displayed_job == job_id:
+                        self._append_output_text(payload)
+                    continue
+                if kind == 'date':
+                    if self.displayed_job == job_id:
+                        self.progress_var.set(f"Processing {name}... will be saved as {payload}.txt")
+                    continue
+
+                self.pending_jobs -= 1
+                if self.pending_jobs == 0:
+                    self.progress_bar.stop()
+                self.streams.pop(job_id, None)
+                # The result replaces the output unless another job's stream is on screen
+                on_screen = self.displayed_job in (None, job_id)
+                if self.displayed_job == job_id:
+                    self.displayed_job = None
+
+                if kind == 'done':
+                    if on_screen:
+                        self._set_output_text(payload.transcription)
+                    self._save_transcription(payload)
+                else:
+                    self.progress_var.set(f"Error occurred during transcription of {name}")
+                    messagebox.showerror("Error", f"{name}: {payload}")
+        except queue.Empty:
+            pass
+
+        self.root.after(100, self._poll_events)
+
+    def _set_output_text(self, text):
+        self.output_text.configure(state='normal')
+        self.output_text.delete('1.0', 'end')
+        self.output_text.insert('end', text)
+        self.output_text.configure(state='disabled')
+
+    def _append_output_text(self, text):
+        self.output_text.configure(state='normal')
+        self.output_text.insert('end', text)
+        self.output_text.see('end')
+        self.output_text.configure(state='disabled')
+
+    def _save_transcription(self, result):
+        # Every transcription goes into the journal store first, so it is kept even
+        # if no file is written; two entries with the same date are two entries there
+        try:
+            self.journal_store.append(result, self.api_client.model_name, TRANSCRIPTION_PROMPT)
+            self.journal_store.flush()
+        except (OSError, sqlite3.Error) as e:
+            self.progress_var.set("Error occurred while saving the transcription")
             messagebox.showerror("Error", str(e))
+            return
+
+        if result.date_str:
+            basename = result.date_str
+        else:
+            self.progress_var.set("No date found in transcription. Waiting for filename...")
+            output_filename = self._prompt_for_filename()
+            if not output_filename:
+                self.progress_var.set("Transcription kept in the journal store but not saved as a file")
+                messagebox.showinfo("Transcription Complete",
+                                    "Transcription completed and kept in the journal store, "
+                                    "but not saved as a file as no filename was provided.")
+                return
+            basename = os.path.splitext(output_filename)[0]
+
+        try:
+            # Adds a numeric suffix instead of overwriting an earlier entry's file
+            output_path = write_transcription(result, os.path.dirname(result.source_path), basename)
+            self.transcript_index.add(output_path, result.transcription, result.date_str, result.source_path)
+        except (OSError, sqlite3.Error) as e:
+            self.progress_var.set("Error occurred while saving the transcription")
+            messagebox.showerror("Error", str(e))
+            return
 
-        finally:
-            self.progress_bar.stop()
-            self.transcribe_button.state(['!disabled'])
+        remaining = f" ({self.pending_jobs} still in progress)" if self.pending_jobs else ""
+        self.progress_var.set(f"Transcription saved to: {os.path.basename(output_path)}{remaining}")
 
     def _prompt_for_filename(self):
         filename = tk.simpledialog.askstring(
@@ -0,0 +1,82 @@
+import math
+import threading
+from collections import deque
+
+
+class LatencyWindow:
+    """The most recent request latencies, for percentile estimates"""
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent):
+        """Nearest-rank percentile of the window, or None if it is empty"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = max(1, math.ceil(percent / 100 * len(samples)))
+        return samples[rank - 1]
+
+
+class HedgePolicy:
+    """
+    Decides when GeminiAPIClient sends a duplicate ("hedge") of a slow request.
+
+    A request that hasn't answered within the given percentile of recent
+    latencies is hedged, and whichever copy answers first wins. At most
+    max_hedge_rate of all requests are hedged, so quota use grows by at most
+    that fraction. No request is hedged until min_samples latencies have
+    been seen.
+    """
+    def __init__(self, percentile=95, window=200, min_samples=10, max_hedge_rate=0.1, min_delay=0.5):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self.min_delay = min_delay
+        self.latencies = LatencyWindow(window)
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+    def hedge_delay(self):
+        """Seconds to wait for the first copy before hedging, or None to never hedge"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_hedge(self):
+        """Claim a hedge if the hedge rate allows one; returns False otherwise"""
+        with self._lock:
+            if self.hedges + 1 > self.max_hedge_rate * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def record_result(self, latency, hedge_won=False):
+        """Record the winning copy's latency, measured from when that copy was sent"""
+        self.latencies.record(latency)
+        if hedge_won:
+            with self._lock:
+                self.wins += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'wins': self.wins,
+                'hedge_delay': self.hedge_delay(),
+            }
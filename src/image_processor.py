@@ -1,19 +1,50 @@
 from PIL import Image
+import io
 import os
+from metrics import metrics
+from utils import ImageHandle
+
+class PreparedImage:
+    """
+    An OCR-ready image held in memory as encoded bytes
+    """
+    def __init__(self, data, mime_type, size, source_path=None):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self.source_path = source_path
+
+    def to_blob(self):
+        """Return the image as an inline blob accepted by the Gemini SDK"""
+        return {'mime_type': self.mime_type, 'data': self.data}
+
 
 class ImageProcessor:
-    def __init__(self):
+    def __init__(self, save_processed_files=False):
         self.supported_formats = {'.jpg', '.jpeg', '.png'}
         self.max_dimension = 2048  # Maximum dimension for either width or height
+        # Debug option: also write <name>_processed.<ext> next to the source image
+        self.save_processed_files = save_processed_files
 
-    def prepare_image(self, image_path):
+    def prepare_image(self, image):
         """
         Prepare image for OCR processing
         - Validate format
         - Resize if necessary
         - Optimize for OCR
+
+        Args:
+            image: ImageHandle for the image, or path to the image file
+
+        Returns:
+            PreparedImage: Encoded image bytes, kept in memory
         """
-        if not os.path.exists(image_path):
+        handle = image if isinstance(image, ImageHandle) else None
+        image_path = handle.path if handle is not None else image
+        if handle is not None and handle.prepared is not None:
+            return handle.prepared
+
+        if handle is None and not os.path.exists(image_path):
             raise FileNotFoundError(f"Image file not found: {image_path}")
 
         file_ext = os.path.splitext(image_path)[1].lower()
@@ -21,23 +52,65 @@ class ImageProcessor:
             raise ValueError(f"Unsupported image format: {file_ext}")
 
         try:
-            # Open and process image
-            with Image.open(image_path) as img:
-                # Convert to RGB if necessary
-                if img.mode not in ('RGB', 'L'):
-                    img = img.convert('RGB')
-
-                # Resize if image is too large
-                if max(img.size) > self.max_dimension:
-                    ratio = self.max_dimension / max(img.size)
-                    new_size = tuple(int(dim * ratio) for dim in img.size)
-                    img = img.resize(new_size, Image.Resampling.LANCZOS)
-
-                # Create temporary processed file
+            # Reuse the handle's decoded pixels instead of opening the file again;
+            # large JPEGs are decoded straight at a reduced scale
+            if handle is None:
+                handle = ImageHandle(image_path)
+            with metrics.span('prepare.decode', source=image_path) as span:
+                img = handle.decode(self.max_dimension)
+                span.set(width=img.width, height=img.height, mode=img.mode)
+            prepared = self.prepare_decoded(img, file_ext, image_path)
+
+            if self.save_processed_files:
                 temp_path = f"{os.path.splitext(image_path)[0]}_processed{file_ext}"
-                img.save(temp_path, quality=95, optimize=True)
+                with open(temp_path, 'wb') as f:
+                    f.write(prepared.data)
 
-                return temp_path
+            handle.prepared = prepared
+            return prepared
 
         except Exception as e:
             raise ValueError(f"Error processing image: {str(e)}")
+
+    def prepare_decoded(self, img, file_ext='.jpeg', source_path=None):
+        """
+        Convert, resize and encode an already decoded image, e.g. a rendered PDF page
+
+        Args:
+            img: PIL image
+            file_ext: '.png' to encode as PNG, anything else encodes as JPEG
+            source_path: Recorded on the PreparedImage and in the stage spans
+
+        Returns:
+            PreparedImage: Encoded image bytes, kept in memory
+        """
+        with metrics.span('prepare.convert', source=source_path):
+            img = self._convert(img)
+        with metrics.span('prepare.resize', source=source_path) as span:
+            img = self._resize(img)
+            span.set(width=img.width, height=img.height)
+        with metrics.span('prepare.encode', source=source_path) as span:
+            prepared = self._encode(img, file_ext, source_path)
+            span.set(encoded_bytes=len(prepared.data))
+        return prepared
+
+    def _convert(self, img):
+        # Convert to RGB if necessary
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        return img
+
+    def _resize(self, img):
+        # Resize if image is too large
+        if max(img.size) > self.max_dimension:
+            ratio = self.max_dimension / max(img.size)
+            new_size = tuple(int(dim * ratio) for dim in img.size)
+            img = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        return img
+
+    def _encode(self, img, file_ext, source_path=None):
+        # Encode in memory instead of round-tripping through a temp file
+        image_format = 'PNG' if file_ext == '.png' else 'JPEG'
+        buffer = io.BytesIO()
+        img.save(buffer, format=image_format, quality=95, optimize=True)
+        return PreparedImage(buffer.getvalue(), Image.MIME[image_format], img.size, source_path)
@@ -0,0 +1,310 @@
+"""
+Append-only store for transcribed journal entries.
+
+Usage:
+    python src/batch.py scans/ --store ~/journal.sqlite3
+    python src/journal_store.py --store ~/journal.sqlite3 list --from 2021-01-01 --to 2021-12-31
+    python src/journal_store.py --store ~/journal.sqlite3 export journal/ --from 2021-01-01
+    python src/journal_store.py --store ~/journal.sqlite3 export journal.jsonl
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from manifest import file_digest
+
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "journal_transcriber", "journal.sqlite3")
+READ_CHUNK_SIZE = 500
+ENTRY_SEPARATOR = "\n\n"
+
+
+class JournalEntry:
+    def __init__(self, id, date, transcription, source, source_sha256, page, model, prompt_sha256,
+                 created, superseded):
+        self.id = id
+        self.date = date
+        self.transcription = transcription
+        self.source = source
+        self.source_sha256 = source_sha256
+        self.page = page
+        self.model = model
+        self.prompt_sha256 = prompt_sha256
+        self.created = created
+        self.superseded = bool(superseded)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+_ENTRY_COLUMNS = ("id, date, transcription, source, source_sha256, page, model, prompt_sha256,"
+                  " created, superseded")
+
+
+class JournalStore:
+    """
+    Transcribed entries in SQLite (WAL mode), one row per transcription,
+    indexed by date. Two entries with the same date are simply two rows.
+
+    Every entry keeps its provenance: the source file and its sha256, the
+    PDF page, the model and the prompt (stored once in a prompts table and
+    referenced by hash). Entries are never rewritten: transcribing the same
+    source page again appends a new entry and marks the older ones as
+    superseded.
+
+    Appends are committed in batches, every commit_every entries or
+    commit_interval seconds, whichever comes first, and on flush() and
+    close(). Each commit is atomic, so a crash loses at most the entries
+    of the batch in progress and never leaves a half-written one.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, commit_every=64, commit_interval=1.0):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.path = path
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._digests = {}  # (path, size, mtime_ns) -> sha256, so a PDF is hashed once for all its pages
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prompts ("
+            " sha256 TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " id INTEGER PRIMARY KEY,"
+            " date TEXT,"
+            " transcription TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " source_sha256 TEXT,"
+            " page INTEGER,"
+            " model TEXT,"
+            " prompt_sha256 TEXT REFERENCES prompts (sha256),"
+            " created REAL NOT NULL,"
+            " superseded INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_date ON entries (date, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_source ON entries (source, page)")
+        self._conn.commit()
+
+    def append(self, result, model=None, prompt=None, source_sha256=None):
+        """
+        Add a TranscriptionResult as a new entry
+
+        Args:
+            result: The TranscriptionResult to store
+            model: Name of the model that produced it
+            prompt: Prompt text it was produced with
+            source_sha256: Digest of the source file; computed from the file if omitted
+
+        Returns:
+            int: The new entry's id
+        """
+        if source_sha256 is None:
+            source_sha256 = self._source_digest(result.source_path)
+        prompt_sha256 = hashlib.sha256(prompt.encode()).hexdigest() if prompt is not None else None
+
+        with self._lock:
+            if prompt_sha256:
+                self._conn.execute("INSERT OR IGNORE INTO prompts (sha256, text) VALUES (?, ?)",
+                                   (prompt_sha256, prompt))
+            self._conn.execute(
+                "UPDATE entries SET superseded = 1 WHERE source = ? AND page IS ? AND NOT superseded",
+                (result.source_path, result.page),
+            )
+            cursor = self._conn.execute(
+                "INSERT INTO entries (date, transcription, source, source_sha256, page, model,"
+                " prompt_sha256, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (result.date_str, result.transcription, result.source_path, source_sha256,
+                 result.page, model, prompt_sha256, time.time()),
+            )
+            self._pending += 1
+            if (self._pending >= self.commit_every
+                    or time.monotonic() - self._last_commit >= self.commit_interval):
+                self._commit()
+            return cursor.lastrowid
+
+    def flush(self):
+        """Commit appended entries now"""
+        with self._lock:
+            self._commit()
+
+    def _commit(self):
+        self._conn.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def _source_digest(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        if key not in self._digests:
+            self._digests[key] = file_digest(path)
+        return self._digests[key]
+
+    def entry_ref(self, entry_id):
+        """Name of an entry used where a file path would be, e.g. journal.sqlite3#entry=12"""
+        return f"{self.path}#entry={entry_id}"
+
+    @staticmethod
+    def ref_id(ref):
+        """Entry id from an entry_ref"""
+        return int(ref.rsplit("#entry=", 1)[1])
+
+    def get(self, entry_id):
+        """
+        Return the JournalEntry with this id, or None
+        """
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_ENTRY_COLUMNS} FROM entries WHERE id = ?",
+                                     (entry_id,)).fetchone()
+        return JournalEntry(*row) if row else None
+
+    def prompt(self, prompt_sha256):
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM prompts WHERE sha256 = ?", (prompt_sha256,)).fetchone()
+        return row[0] if row else None
+
+    def entries(self, date_from=None, date_to=None, include_superseded=False):
+        """
+        Iterate over entries in date order (then in the order they were
+        added). Without a date range, undated entries come first.
+
+        Args:
+            date_from: Earliest date (YYYY-MM-DD), inclusive
+            date_to: Latest date (YYYY-MM-DD), inclusive
+            include_superseded: Also return entries replaced by a later transcription
+
+        Yields:
+            JournalEntry
+        """
+        conditions, params = [], []
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        if not include_superseded:
+            conditions.append("NOT superseded")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # Only the ids are read up front; rows are fetched a chunk at a time
+        # so the lock isn't held while the caller consumes them
+        with self._lock:
+            ids = [entry_id for (entry_id,) in
+                   self._conn.execute(f"SELECT id FROM entries{where} ORDER BY date, id", params)]
+        for start in range(0, len(ids), READ_CHUNK_SIZE):
+            chunk = ids[start:start + READ_CHUNK_SIZE]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {_ENTRY_COLUMNS} FROM entries WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+            rows.sort(key=lambda row: (row[1] is not None, row[1] or "", row[0]))
+            for row in rows:
+                yield JournalEntry(*row)
+
+    def export(self, destination, date_from=None, date_to=None):
+        """
+        Write entries out as JSON lines (destination ending in .jsonl, one
+        object per entry with its provenance) or as a directory with one
+        <date>.txt per day, entries of the same day separated by a blank
+        line. Undated entries go to <source name>[_p<page>].txt.
+
+        Returns:
+            int: Number of entries exported
+        """
+        count = 0
+        if destination.endswith(".jsonl"):
+            with open(destination, "w", encoding="utf-8") as f:
+                for entry in self.entries(date_from, date_to):
+                    f.write(json.dumps(entry.to_dict()) + "\n")
+                    count += 1
+            return count
+
+        os.makedirs(destination, exist_ok=True)
+        current_name, current_file = None, None
+        try:
+            for entry in self.entries(date_from, date_to):
+                name = entry.date or _undated_name(entry)
+                if name == current_name:
+                    current_file.write(ENTRY_SEPARATOR)
+                else:
+                    if current_file:
+                        current_file.close()
+                    current_name = name
+                    current_file = open(os.path.join(destination, f"{name}.txt"), "w", encoding="utf-8")
+                current_file.write(entry.transcription)
+                count += 1
+        finally:
+            if current_file:
+                current_file.close()
+        return count
+
+    def stats(self):
+        with self._lock:
+            entries, dates, superseded = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT date), COALESCE(SUM(superseded), 0) FROM entries"
+            ).fetchone()
+        return {"entries": entries, "dates": dates, "superseded": superseded}
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
+
+
+def _undated_name(entry):
+    name = os.path.splitext(os.path.basename(entry.source))[0]
+    if entry.page is not None:
+        name = f"{name}_p{entry.page:03d}"
+    return name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read and export the journal store.")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH,
+                        help=f"Journal store database (default: {DEFAULT_STORE_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, description in (("list", "Print entries"), ("export", "Export entries to a directory or .jsonl file")):
+        command = commands.add_parser(name, help=description)
+        if name == "export":
+            command.add_argument("destination", help="Directory for <date>.txt files, or a .jsonl file")
+        command.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD", help="Earliest entry date")
+        command.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD", help="Latest entry date")
+    commands.add_parser("stats", help="Count entries")
+    args = parser.parse_args(argv)
+
+    store = JournalStore(args.store)
+    try:
+        if args.command == "stats":
+            stats = store.stats()
+            print(f"{stats['entries']} entries on {stats['dates']} dates ({stats['superseded']} superseded)")
+        elif args.command == "list":
+            for entry in store.entries(args.date_from, args.date_to):
+                page = f" page {entry.page}" if entry.page is not None else ""
+                print(f"=== {entry.date or 'undated'}  {entry.source}{page}  [{entry.model}]")
+                print(entry.transcription + "\n")
+        else:
+            start = time.perf_counter()
+            count = store.export(args.destination, args.date_from, args.date_to)
+            print(f"Exported {count} entries to {args.destination} in {time.perf_counter() - start:.2f}s")
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
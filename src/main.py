@@ -0,0 +1,420 @@
+"""
+HTTP transcription service.
+
+Uploads are queued and processed by a pool of background workers, so an
+upload request returns a job ID immediately instead of holding a thread
+for the whole model call. Clients poll the job status/result endpoints,
+or follow /jobs/<id>/stream to receive the transcription as server-sent
+events while it is generated. Finished transcriptions are indexed and
+can be searched through /search.
+
+Environment:
+    GEMINI_API_KEY        API key for every job; when set, keys sent with uploads are
+                          rejected (otherwise each upload brings its own key)
+    TRANSCRIBER_WORKERS   Number of worker threads (default: 4)
+    TRANSCRIBER_ADAPTIVE  If set to 1, adapt concurrent API calls to latency and
+                          throttling, with TRANSCRIBER_WORKERS as the ceiling
+    TRANSCRIBER_MAX_QUEUE Maximum queued jobs before returning 503 (default: 64)
+    TRANSCRIBER_RPM       Client-side requests-per-minute limit (default: none)
+    TRANSCRIBER_TPM       Client-side tokens-per-minute limit (default: none)
+    TRANSCRIBER_HEDGE_PERCENTILE  Hedge requests slower than this latency percentile (default: off)
+    TRANSCRIBER_STORE     Journal store every transcription is appended to
+                          (default: ~/.cache/journal_transcriber/journal.sqlite3)
+"""
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from dotenv import load_dotenv
+from flask import Flask, Response, jsonify, render_template, request, url_for
+from werkzeug.utils import secure_filename
+
+from api_client import TRANSCRIPTION_PROMPT, GeminiAPIClient
+from hedging import HedgePolicy
+from image_processor import ImageProcessor
+from journal_store import DEFAULT_STORE_PATH, JournalStore
+from metrics import PrometheusSink, metrics
+from pipeline import TranscriptionStream, write_transcription
+from rate_limiter import AdaptiveConcurrencyLimiter
+from transcript_index import TranscriptIndex
+from transcription_cache import TranscriptionCache
+
+load_dotenv()
+
+UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads')
+WORKERS = int(os.environ.get('TRANSCRIBER_WORKERS', 4))
+ADAPTIVE_CONCURRENCY = os.environ.get('TRANSCRIBER_ADAPTIVE') == '1'
+MAX_QUEUE_DEPTH = int(os.environ.get('TRANSCRIBER_MAX_QUEUE', 64))
+REQUESTS_PER_MINUTE = int(os.environ.get('TRANSCRIBER_RPM', 0)) or None
+TOKENS_PER_MINUTE = int(os.environ.get('TRANSCRIBER_TPM', 0)) or None
+HEDGE_PERCENTILE = float(os.environ.get('TRANSCRIBER_HEDGE_PERCENTILE', 0)) or None
+STORE_PATH = os.environ.get('TRANSCRIBER_STORE', DEFAULT_STORE_PATH)
+MAX_API_CLIENTS = 16  # Clients kept for per-upload API keys before the least recently used is dropped
+MAX_FINISHED_JOBS = 1000  # Finished jobs kept for polling before the oldest are dropped
+STREAM_KEEPALIVE_SECONDS = 15
+
+app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # Same limit as validate_image_file
+
+
+class Job:
+    def __init__(self, job_id, file_path, api_key):
+        self.id = job_id
+        self.file_path = file_path
+        self.api_key = api_key
+        self.status = 'queued'
+        self.created = time.time()
+        self.finished = None
+        self.result = None
+        self.output_file = None
+        self.entry_id = None
+        self.error = None
+        # Filled in while the transcription streams in; changed is notified on every update
+        self.chunks = []
+        self.date = None
+        self.changed = threading.Condition()
+
+    def update(self, **attrs):
+        with self.changed:
+            for name, value in attrs.items():
+                setattr(self, name, value)
+            self.changed.notify_all()
+
+    def add_chunk(self, chunk, date):
+        with self.changed:
+            self.chunks.append(chunk)
+            self.date = date
+            self.changed.notify_all()
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'filename': os.path.basename(self.file_path),
+            'created': self.created,
+            'finished': self.finished,
+        }
+        if self.status == 'done':
+            data.update({
+                'date': self.result.date_str,
+                'transcription': self.result.transcription,
+                'output_file': os.path.basename(self.output_file),
+                'entry_id': self.entry_id,
+            })
+        elif self.status == 'error':
+            data['error'] = self.error
+        elif self.status == 'processing':
+            data['date'] = self.date
+        return data
+
+
+class TranscriptionService:
+    """
+    Bounded job queue plus a pool of worker threads running the
+    ImageProcessor -> GeminiAPIClient -> extract_date pipeline.
+    """
+    def __init__(self, workers=WORKERS, max_queue_depth=MAX_QUEUE_DEPTH, api_key=None, model=None):
+        self.image_processor = ImageProcessor()
+        self.cache = TranscriptionCache()
+        self.transcript_index = TranscriptIndex()
+        self.journal_store = JournalStore(STORE_PATH)
+        self.default_api_key = api_key
+        self.model = model  # Injected model backend (e.g. for load tests) instead of Gemini
+        self.jobs = {}
+        self.job_queue = queue.Queue(maxsize=max_queue_depth)
+        self._api_clients = OrderedDict()  # API key -> GeminiAPIClient, least recently used first
+        self._clients_in_use = Counter()  # GeminiAPIClient -> jobs using it
+        self._evicted_clients = set()  # Dropped from _api_clients, closed once no job uses them
+        # One policy for the service's lifetime, shared by the clients of every API key
+        self.hedge_policy = HedgePolicy(percentile=HEDGE_PERCENTILE) if HEDGE_PERCENTILE else None
+        self.concurrency_limiter = None
+        if ADAPTIVE_CONCURRENCY:
+            self.concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=min(4, workers),
+                                                                  max_limit=workers)
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"transcriber-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, file_path, api_key=None):
+        """
+        Queue a saved upload for transcription.
+
+        Raises:
+            ValueError: If api_key is given while the service has its own key
+            queue.Full: If the queue is at its maximum depth
+        """
+        if api_key and self.default_api_key and api_key != self.default_api_key:
+            # Jobs would otherwise be sent and billed under a key the uploader did not choose
+            raise ValueError("This server uses its own Gemini API key; don't send one with the upload")
+        job = Job(uuid.uuid4().hex, file_path, api_key or self.default_api_key)
+        with self._lock:
+            self.jobs[job.id] = job
+        try:
+            self.job_queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self.jobs[job.id]
+            raise
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _get_api_client(self, api_key):
+        # One client per key: each sends its requests with its own key and keeps its own quota
+        with self._lock:
+            api_client = self._api_clients.get(api_key)
+            if api_client is None:
+                api_client = GeminiAPIClient(api_key=api_key, max_concurrency=len(self._workers),
+                                             cache=self.cache,
+                                             requests_per_minute=REQUESTS_PER_MINUTE,
+                                             tokens_per_minute=TOKENS_PER_MINUTE,
+                                             hedge_policy=self.hedge_policy,
+                                             concurrency_limiter=self.concurrency_limiter,
+                                             model=self.model)
+                self._api_clients[api_key] = api_client
+                while len(self._api_clients) > MAX_API_CLIENTS:
+                    _, evicted = self._api_clients.popitem(last=False)
+                    self._evicted_clients.add(evicted)
+            else:
+                self._api_clients.move_to_end(api_key)
+            self._clients_in_use[api_client] += 1
+            return api_client
+
+    def _release_api_client(self, api_client):
+        # An evicted client is closed once the last job using it is done
+        with self._lock:
+            self._clients_in_use[api_client] -= 1
+            idle = [client for client in self._evicted_clients if not self._clients_in_use[client]]
+            for client in idle:
+                self._evicted_clients.discard(client)
+                del self._clients_in_use[client]
+        for client in idle:
+            client.close()
+
+    def _worker(self):
+        while True:
+            job = self.job_queue.get()
+            job.update(status='processing')
+            api_client = None
+            try:
+                api_client = self._get_api_client(job.api_key)
+                stream = TranscriptionStream(job.file_path, self.image_processor, api_client)
+                for chunk in stream:
+                    job.add_chunk(chunk, stream.date_str)
+                # The store is the record of every transcription; the .txt file is a copy
+                # for download, created next to the upload without replacing another
+                entry_id = self.journal_store.append(stream.result, api_client.model_name, TRANSCRIPTION_PROMPT)
+                self.journal_store.flush()
+                output_file = write_transcription(stream.result)
+                self.transcript_index.add(output_file, stream.result.transcription,
+                                          stream.result.date_str, stream.result.source_path)
+                job.update(result=stream.result, output_file=output_file, entry_id=entry_id,
+                           status='done', finished=time.time())
+            except Exception as e:
+                job.update(error=str(e), status='error', finished=time.time())
+            finally:
+                if api_client is not None:
+                    self._release_api_client(api_client)
+                self._prune_finished_jobs()
+
+    def _prune_finished_jobs(self):
+        with self._lock:
+            finished = [job for job in self.jobs.values() if job.finished is not None]
+            if len(finished) <= MAX_FINISHED_JOBS:
+                return
+            finished.sort(key=lambda job: job.finished)
+            for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+                del self.jobs[job.id]
+
+
+service = None
+_service_lock = threading.Lock()
+prometheus = PrometheusSink()
+metrics.add_sink(prometheus)
+
+
+def get_service():
+    global service
+    # Concurrent first requests must not each start a service of their own
+    with _service_lock:
+        if service is None:
+            service = TranscriptionService(api_key=os.environ.get('GEMINI_API_KEY'))
+    return service
+
+
+@app.route('/')
+def index():
+    return render_template('index.html', server_api_key=bool(get_service().default_api_key))
+
+
+@app.route('/upload', methods=['POST'])
+def upload():
+    file = request.files.get('file')
+    if file is None or not file.filename:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    transcription_service = get_service()
+    api_key = request.form.get('api_key', '').strip() or None
+    if not (api_key or transcription_service.default_api_key):
+        return jsonify({'error': 'Gemini API key is required'}), 400
+    if api_key and transcription_service.default_api_key and api_key != transcription_service.default_api_key:
+        return jsonify({'error': "This server uses its own Gemini API key; don't send one with the upload"}), 400
+
+    filename = secure_filename(file.filename)
+    if os.path.splitext(filename)[1].lower() not in transcription_service.image_processor.supported_formats:
+        return jsonify({'error': 'Unsupported file format'}), 400
+    if transcription_service.job_queue.full():
+        return _queue_full_response()
+
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    # Prefix with a short random id so concurrent uploads of IMG_0001.jpg don't collide
+    file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex[:8]}_{filename}")
+    file.save(file_path)
+
+    try:
+        job = transcription_service.submit(file_path, api_key)
+    except queue.Full:
+        os.remove(file_path)
+        return _queue_full_response()
+
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('job_status', job_id=job.id),
+        'result_url': url_for('job_result', job_id=job.id),
+        'stream_url': url_for('job_stream', job_id=job.id),
+    }), 202
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_service().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = get_service().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job.status == 'error':
+        return jsonify(job.to_dict()), 500
+    if job.status != 'done':
+        return jsonify(job.to_dict()), 202
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/stream')
+def job_stream(job_id):
+    """
+    Server-sent events for one job: 'status' when it starts processing,
+    'chunk' for each piece of transcribed text, 'date' as soon as the date
+    is known, and finally 'done' or 'error' with the same body as the
+    result endpoint.
+    """
+    job = get_service().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return Response(_job_events(job), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _job_events(job):
+    sent_chunks, status, date = 0, None, None
+    while True:
+        with job.changed:
+            job.changed.wait_for(
+                lambda: (job.status != status or job.date != date
+                         or len(job.chunks) > sent_chunks or job.finished is not None),
+                timeout=STREAM_KEEPALIVE_SECONDS,
+            )
+            new_chunks = job.chunks[sent_chunks:]
+            sent_chunks += len(new_chunks)
+            new_status, new_date, finished = job.status, job.date, job.finished is not None
+
+        if not (new_chunks or new_status != status or new_date != date or finished):
+            yield ': keepalive\n\n'
+            continue
+        if new_status != status and not finished:
+            yield _sse('status', {'status': new_status})
+        for chunk in new_chunks:
+            yield _sse('chunk', {'text': chunk})
+        if new_date != date:
+            yield _sse('date', {'date': new_date})
+        if finished:
+            yield _sse('done' if new_status == 'done' else 'error', job.to_dict())
+            return
+        status, date = new_status, new_date
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/search')
+def search():
+    """
+    Search finished transcriptions: q holds words that must all appear,
+    each phrase parameter an exact phrase, from/to an entry date range.
+    """
+    terms = request.args.get('q', '').split()
+    phrases = request.args.getlist('phrase')
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    start = time.perf_counter()
+    hits = get_service().transcript_index.search(terms, phrases, request.args.get('from'),
+                                                 request.args.get('to'), limit)
+    return jsonify({
+        'results': [hit._asdict() for hit in hits],
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 2),
+    })
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return prometheus.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+
+@app.route('/concurrency')
+def concurrency():
+    limiter = get_service().concurrency_limiter
+    if limiter is None:
+        return jsonify({'adaptive': False, 'limit': WORKERS})
+    return jsonify({
+        'adaptive': True,
+        'limit': limiter.limit,
+        'in_flight': limiter.in_flight,
+        'history': [{'timestamp': timestamp, 'limit': limit} for timestamp, limit in limiter.history()],
+    })
+
+
+def _queue_full_response():
+    response = jsonify({'error': 'Server is busy, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
+
+
+def serve(host='0.0.0.0', port=5000):
+    """Start the workers and run the development server"""
+    get_service()
+    app.run(host=host, port=port, threaded=True)
+
+
+if __name__ == '__main__':
+    serve()
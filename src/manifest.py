@@ -0,0 +1,99 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.expanduser("~"), ".cache", "journal_transcriber", "manifest.sqlite3")
+
+DONE = 'done'
+FAILED = 'failed'
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Return the sha256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ManifestEntry:
+    def __init__(self, path, size, mtime_ns, sha256, output, status, error, updated):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.sha256 = sha256
+        self.output = output
+        self.status = status
+        self.error = error
+        self.updated = updated
+
+    def matches_stat(self, stat):
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+
+class Manifest:
+    """
+    Persistent record of which source images have been transcribed, stored
+    in SQLite: path, size, mtime and content hash of each image, mapped to
+    its output file. Every result is committed as soon as it is recorded,
+    so after a crash only the images that were in flight are redone.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " output TEXT,"
+            " status TEXT NOT NULL,"
+            " error TEXT,"
+            " updated REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, path):
+        """
+        Return the ManifestEntry for an absolute source path, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, size, mtime_ns, sha256, output, status, error, updated"
+                " FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def record(self, path, stat, sha256, status, output=None, error=None):
+        """
+        Store the outcome for a source image, replacing any earlier entry
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256, output, status, error, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, sha256, output, status, error, time.time()),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Return the number of entries per status
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
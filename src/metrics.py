@@ -0,0 +1,160 @@
+import json
+import sys
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Span:
+    """
+    Times one pipeline stage. Extra attributes (image size, bytes uploaded,
+    token usage, ...) can be attached with set() before the span ends.
+    """
+    def __init__(self, metrics, name, attrs):
+        self.metrics = metrics
+        self.name = name
+        self.attrs = attrs
+        self.start = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.metrics.record(self.name, duration, **self.attrs)
+        return False
+
+
+class Metrics:
+    """
+    Fan-out point for stage timings. With no sinks attached, recording a
+    span costs two perf_counter() calls and nothing is kept.
+    """
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks or [])
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+    def span(self, name, **attrs):
+        return Span(self, name, attrs)
+
+    def record(self, name, duration, **attrs):
+        if not self.sinks:
+            return
+        event = {'span': name, 'duration_s': duration, 'timestamp': time.time()}
+        event.update(attrs)
+        self.emit(event)
+
+    def emit(self, event):
+        """Pass on an event recorded elsewhere, e.g. by a worker process's BufferSink"""
+        for sink in self.sinks:
+            sink.emit(event)
+
+
+class BufferSink:
+    """Keeps events until drained, so a worker process can send its spans to the parent"""
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+    def drain(self):
+        events, self.events = self.events, []
+        return events
+
+
+class JsonLogSink:
+    """Writes one JSON object per finished span"""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+class PrometheusSink:
+    """
+    Aggregates span durations into histograms (one series per stage) and
+    sums numeric attributes such as bytes uploaded and token counts into
+    counters. render() returns the Prometheus text exposition format.
+    """
+    def __init__(self, prefix='journal_transcriber', buckets=DEFAULT_BUCKETS,
+                 counter_attrs=('bytes_uploaded', 'prompt_tokens', 'output_tokens', 'total_tokens',
+                                'hedge_won')):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.counter_attrs = counter_attrs
+        self._histograms = {}  # stage -> [bucket counts..., +Inf count, sum]
+        self._counters = {}  # (attr, stage) -> total
+        self._errors = {}  # stage -> count
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        stage = event['span']
+        duration = event['duration_s']
+        with self._lock:
+            histogram = self._histograms.setdefault(stage, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram[i] += 1
+            histogram[len(self.buckets)] += 1
+            histogram[-1] += duration
+
+            if 'error' in event:
+                self._errors[stage] = self._errors.get(stage, 0) + 1
+            for attr in self.counter_attrs:
+                value = event.get(attr)
+                if isinstance(value, (int, float)):
+                    self._counters[(attr, stage)] = self._counters.get((attr, stage), 0) + value
+
+    def render(self):
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each pipeline stage.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram[len(self.buckets)]}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram[-1]}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram[len(self.buckets)]}')
+
+            errors_name = f"{self.prefix}_stage_errors_total"
+            lines.append(f"# TYPE {errors_name} counter")
+            for stage, count in sorted(self._errors.items()):
+                lines.append(f'{errors_name}{{stage="{stage}"}} {count}')
+
+            for attr in self.counter_attrs:
+                counter_name = f"{self.prefix}_{attr}_total"
+                lines.append(f"# TYPE {counter_name} counter")
+                for (counter_attr, stage), total in sorted(self._counters.items()):
+                    if counter_attr == attr:
+                        lines.append(f'{counter_name}{{stage="{stage}"}} {total}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            f.write(self.render())
+
+
+# Process-wide instance used by the pipeline modules
+metrics = Metrics()
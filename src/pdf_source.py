@@ -0,0 +1,82 @@
+"""
+PDF input: pages are rasterized one at a time, straight at the size
+ImageProcessor sends to the model, so memory use does not grow with the
+number of pages.
+
+Needs the optional pypdfium2 dependency (pip install '.[pdf]').
+"""
+import os
+
+from metrics import metrics
+
+PDF_EXTENSION = '.pdf'
+POINTS_PER_INCH = 72
+
+
+def _import_pdfium():
+    try:
+        import pypdfium2
+    except ImportError:
+        raise ImportError("PDF input requires pypdfium2: pip install pypdfium2") from None
+    return pypdfium2
+
+
+def is_pdf(path):
+    return os.path.splitext(path)[1].lower() == PDF_EXTENSION
+
+
+def page_source(pdf_path, page_number):
+    """Name used for a page in spans, cache keys and logs, e.g. notebook.pdf#page=3"""
+    return f"{pdf_path}#page={page_number}"
+
+
+class PdfPages:
+    """
+    Lazily rendered pages of one PDF document.
+
+    render_page(n) renders one page only when it is asked for and releases
+    the page and its bitmap before returning, so a page that fails to render
+    can be reported on its own and the next one still rendered. Pages are
+    rendered at the DPI that makes their longest side exactly
+    image_processor.max_dimension pixels.
+    """
+    def __init__(self, path, image_processor):
+        self.path = path
+        self.image_processor = image_processor
+        pdfium = _import_pdfium()
+        try:
+            self._document = pdfium.PdfDocument(path)
+        except pdfium.PdfiumError as e:
+            raise ValueError(f"Invalid or corrupted PDF file: {e}") from None
+
+    def __len__(self):
+        return len(self._document)
+
+    def render_page(self, page_number):
+        """Render and prepare one page (1-based)"""
+        source = page_source(self.path, page_number)
+        page = self._document[page_number - 1]
+        bitmap = None
+        try:
+            with metrics.span('prepare.render', source=source) as span:
+                width, height = page.get_size()  # In points
+                scale = self.image_processor.max_dimension / max(width, height)
+                bitmap = page.render(scale=scale, limit_image_cache=True)
+                # May share the bitmap's buffer, so the bitmap stays open until encoded
+                img = bitmap.to_pil()
+                span.set(dpi=round(scale * POINTS_PER_INCH, 1), width=img.width, height=img.height)
+            return self.image_processor.prepare_decoded(img, '.jpeg', source)
+        finally:
+            if bitmap is not None:
+                bitmap.close()
+            page.close()
+
+    def close(self):
+        self._document.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
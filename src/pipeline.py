@@ -0,0 +1,229 @@
+import os
+from api_client import DEFAULT_PACK_TOKEN_BUDGET
+from date_extractor import IncrementalDateExtractor, extract_date
+from image_processor import ImageProcessor
+from metrics import BufferSink, metrics
+from utils import validate_image_file
+
+
+class TranscriptionResult:
+    def __init__(self, source_path, transcription, date_str=None, page=None):
+        self.source_path = source_path
+        self.transcription = transcription
+        self.date_str = date_str
+        self.page = page  # First page, for results from a PDF
+
+    @property
+    def output_basename(self):
+        """
+        Name of the output file: the extracted date when there is one,
+        otherwise the source image name (plus the page number for PDFs).
+        """
+        if self.date_str:
+            return self.date_str
+        basename = os.path.splitext(os.path.basename(self.source_path))[0]
+        if self.page is not None:
+            basename = f"{basename}_p{self.page:03d}"
+        return basename
+
+
+def transcribe_file(file_path, image_processor, api_client):
+    """
+    Run the full pipeline for a single image file:
+    validate -> prepare -> transcribe -> extract date
+
+    Args:
+        file_path: Path to the image, or an ImageHandle already loaded for it
+
+    Returns:
+        TranscriptionResult: date_str is None if no date was found
+    """
+    image = validate_image_file(file_path)
+    file_path = image.path
+    processed_image = image_processor.prepare_image(image)
+    transcription = api_client.transcribe_image(processed_image)
+    return TranscriptionResult(file_path, transcription, _extract_date_or_none(transcription))
+
+
+class TranscriptionStream:
+    """
+    Streaming version of transcribe_file. Iterating yields text chunks as
+    the model generates them; date_str is filled in as soon as a date shows
+    up in the text, and result is set once the stream has been read to the end.
+    """
+    def __init__(self, file_path, image_processor, api_client):
+        self.file_path = file_path
+        self.image_processor = image_processor
+        self.api_client = api_client
+        self.dates = IncrementalDateExtractor()
+        self.result = None
+
+    @property
+    def date_str(self):
+        return self.dates.date
+
+    def __iter__(self):
+        image = validate_image_file(self.file_path)
+        processed_image = self.image_processor.prepare_image(image)
+        for chunk in self.api_client.transcribe_image_stream(processed_image):
+            self.dates.feed(chunk)
+            yield chunk
+
+        date_str = self.dates.finish()
+        self.result = TranscriptionResult(image.path, self.dates.text.strip(), date_str)
+
+
+def transcribe_files_packed(file_paths, image_processor, api_client,
+                            pack_size=4, token_budget=DEFAULT_PACK_TOKEN_BUDGET):
+    """
+    Run the pipeline for a group of files, sending up to pack_size pages
+    per API request (see GeminiAPIClient.transcribe_images_packed).
+
+    Returns:
+        list: (file_path, TranscriptionResult or the Exception that stopped it) per file
+    """
+    outcomes = {}
+    prepared = []
+    for file_path in file_paths:
+        try:
+            image = validate_image_file(file_path)
+            prepared.append((file_path, image_processor.prepare_image(image)))
+        except Exception as e:
+            outcomes[file_path] = e
+
+    outcomes.update(transcribe_prepared(prepared, api_client, pack_size, token_budget))
+    return [(file_path, outcomes[file_path]) for file_path in file_paths]
+
+
+def transcribe_prepared(prepared, api_client, pack_size=1, token_budget=DEFAULT_PACK_TOKEN_BUDGET):
+    """
+    The API half of the pipeline, for images that were already prepared
+    (possibly in another process): transcribe -> extract date.
+
+    Args:
+        prepared: List of (file_path, PreparedImage)
+
+    Returns:
+        list: (file_path, TranscriptionResult or the Exception that stopped it) per image
+    """
+    if not prepared:
+        return []
+    if pack_size == 1 or len(prepared) == 1:
+        outcomes = []
+        for file_path, image in prepared:
+            try:
+                text = api_client.transcribe_image(image)
+                outcomes.append((file_path, TranscriptionResult(file_path, text, _extract_date_or_none(text))))
+            except Exception as e:
+                outcomes.append((file_path, e))
+        return outcomes
+
+    try:
+        texts = api_client.transcribe_images_packed([image for _, image in prepared], pack_size, token_budget,
+                                                    return_exceptions=True)
+    except Exception as e:
+        return [(file_path, e) for file_path, _ in prepared]
+    # Pages fail one by one: a failed page doesn't take its pack-mates with it
+    return [(file_path, text if isinstance(text, Exception)
+             else TranscriptionResult(file_path, text, _extract_date_or_none(text)))
+            for (file_path, _), text in zip(prepared, texts)]
+
+
+# ImageProcessor of a preprocessing worker process, and the buffer its spans
+# are collected in when the parent records metrics; set up by init_prepare_worker
+_worker_image_processor = None
+_worker_spans = None
+
+
+def init_prepare_worker(save_processed_files=False, max_dimension=None, forward_metrics=False):
+    """Process pool initializer for prepare_file"""
+    global _worker_image_processor, _worker_spans
+    _worker_image_processor = ImageProcessor(save_processed_files=save_processed_files)
+    if max_dimension:
+        _worker_image_processor.max_dimension = max_dimension
+    if forward_metrics:
+        _worker_spans = BufferSink()
+        metrics.add_sink(_worker_spans)
+
+
+def prepare_file(file_path):
+    """
+    The CPU-bound half of the pipeline, run in a worker process:
+    validate -> prepare. The returned PreparedImage only holds the encoded
+    bytes, so sending it back to the parent process is cheap.
+
+    Returns:
+        tuple: (PreparedImage or the Exception that stopped it, list of the
+        metrics events recorded meanwhile, for the parent to metrics.emit())
+    """
+    try:
+        image = validate_image_file(file_path)
+        outcome = _worker_image_processor.prepare_image(image)
+    except Exception as e:
+        outcome = e
+    return outcome, _worker_spans.drain() if _worker_spans else []
+
+
+def group_entries(page_outcomes):
+    """
+    Merge consecutive PDF pages into journal entries: a page with a date
+    starts a new entry and undated pages after it continue that entry.
+    Undated pages before the first date stay separate.
+
+    Args:
+        page_outcomes: (file_path, TranscriptionResult or Exception) per page, in page order
+
+    Yields:
+        (file_path, TranscriptionResult or Exception): Failed pages are passed
+        through as they come, without ending the current entry
+    """
+    entry = None
+    for file_path, outcome in page_outcomes:
+        if isinstance(outcome, Exception):
+            yield file_path, outcome
+            continue
+        if entry is not None and not outcome.date_str:
+            entry.transcription += "\n\n" + outcome.transcription
+            continue
+        if entry is not None:
+            yield entry.source_path, entry
+        if outcome.date_str:
+            entry = outcome
+        else:
+            yield file_path, outcome
+    if entry is not None:
+        yield entry.source_path, entry
+
+
+def _extract_date_or_none(transcription):
+    try:
+        return extract_date(transcription)
+    except ValueError:
+        return None
+
+
+def write_transcription(result, output_dir=None, basename=None):
+    """
+    Write a transcription to <output_dir>/<date>.txt (or <image name>.txt,
+    or <basename>.txt when given). Existing files are never overwritten; a
+    numeric suffix is added instead, so concurrent workers producing the
+    same date don't clobber each other.
+
+    Returns:
+        str: Path of the written file
+    """
+    if output_dir is None:
+        output_dir = os.path.dirname(result.source_path)
+
+    base = os.path.join(output_dir, basename or result.output_basename)
+    output_path = f"{base}.txt"
+    suffix = 1
+    while True:
+        try:
+            # 'x' fails if the file already exists, which makes the check atomic
+            with open(output_path, 'x') as f:
+                f.write(result.transcription)
+            return output_path
+        except FileExistsError:
+            suffix += 1
+            output_path = f"{base}_{suffix}.txt"
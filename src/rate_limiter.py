@@ -0,0 +1,232 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from hedging import LatencyWindow
+
+THROTTLED = 'throttled'
+TRANSIENT = 'transient'
+FATAL = 'fatal'
+
+
+# e.g. "Please retry in 17.5s." or "retry_delay { seconds: 17 }"
+_RETRY_AFTER_PATTERNS = (
+    re.compile(r'retry in ([\d.]+)\s*s', re.IGNORECASE),
+    re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+)', re.IGNORECASE),
+)
+
+
+def classify_error(error):
+    """
+    Sort an API error into THROTTLED (429 / quota), TRANSIENT (5xx, timeouts,
+    dropped connections) or FATAL (bad request, auth, ...). Only the first
+    two are worth retrying.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return TRANSIENT
+    # Imported here so that importing this module doesn't load google.api_core
+    from google.api_core import exceptions as google_exceptions
+
+    if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+        return THROTTLED
+    if isinstance(error, (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError,
+                          google_exceptions.DeadlineExceeded, google_exceptions.GatewayTimeout,
+                          google_exceptions.Aborted)):
+        return TRANSIENT
+    return FATAL
+
+
+def retry_after_hint(error):
+    """Return the server's suggested retry delay in seconds, if the error carries one"""
+    for detail in getattr(error, 'details', None) or []:
+        retry_delay = getattr(detail, 'retry_delay', None)  # google.rpc.RetryInfo
+        if retry_delay is not None and hasattr(retry_delay, 'seconds'):
+            return retry_delay.seconds + getattr(retry_delay, 'nanos', 0) / 1e9
+
+    message = str(error)
+    for pattern in _RETRY_AFTER_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate_per_minute.
+
+    reserve() never blocks: it takes the tokens (possibly going into debt) and
+    returns how long the caller must wait before using them. That lets the
+    same bucket serve threads (time.sleep) and coroutines (asyncio.sleep),
+    and makes callers queue up in arrival order instead of racing.
+    """
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount=1):
+        """Take amount tokens and return the seconds to wait before proceeding"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def try_acquire(self, amount=1):
+        """Take amount tokens only if they are available right now"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < amount:
+                return False
+            self._tokens -= amount
+            return True
+
+    def adjust(self, amount):
+        """Charge (or refund, if negative) tokens after the fact, e.g. actual vs estimated usage"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honoring server retry-after hints"""
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number attempt (0-based)"""
+        if retry_after is not None:
+            # Never retry earlier than the server asked; jitter spreads the pool out
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Shared by every worker using one GeminiAPIClient. After failure_threshold
+    consecutive throttling errors (or a server retry-after hint) it opens and
+    all callers pause until the cooldown ends, instead of each worker
+    hammering a throttled endpoint on its own schedule.
+    """
+    def __init__(self, failure_threshold=3, cooldown=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.trips = 0
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause_remaining(self):
+        """Seconds callers must wait before sending another request"""
+        return max(0.0, self._open_until - time.monotonic())
+
+    @property
+    def is_open(self):
+        return self.pause_remaining() > 0
+
+    def record_throttle(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            self._failures += 1
+            pause = retry_after or 0.0
+            if self._failures >= self.failure_threshold:
+                pause = max(pause, self.cooldown)
+            if pause and now + pause > self._open_until:
+                if self._open_until <= now:
+                    self.trips += 1
+                self._open_until = now + pause
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on concurrent API requests.
+
+    Each successful request with normal latency raises the limit by
+    increase / limit, i.e. by about `increase` per round of requests. A
+    throttling error or a latency spike (recent average latency above
+    latency_tolerance times the median of the last `window` requests) cuts it
+    by decrease_factor. Feedback from requests sent before the last cut is
+    ignored, so a burst of 429s from requests already in flight counts as
+    one signal.
+    """
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=32, increase=1.0,
+                 decrease_factor=0.5, latency_tolerance=2.0, window=100, history_size=1000):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.latencies = LatencyWindow(window)
+        self.in_flight = 0
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._recent_latency = None  # Short-term moving average
+        self._last_decrease = 0.0
+        self._history = deque([(time.time(), int(self._limit))], maxlen=history_size)
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def history(self):
+        """List of (unix time, limit) for every change of the limit"""
+        with self._condition:
+            return list(self._history)
+
+    def acquire(self):
+        """Block until a request slot is free; returns the token to pass to release()"""
+        with self._condition:
+            while self.in_flight >= int(self._limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started, succeeded=True, throttled=False):
+        """
+        Free the slot taken at `started` and feed back the outcome. Requests
+        sent before the last decrease say nothing about the new limit, so
+        only their slot is freed.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if started >= self._last_decrease:
+                if throttled:
+                    self._decrease()
+                elif succeeded:
+                    self._record_latency(time.monotonic() - started)
+            self._condition.notify_all()
+
+    def _record_latency(self, latency):
+        baseline = self.latencies.percentile(50)
+        self._recent_latency = (latency if self._recent_latency is None
+                                else 0.8 * self._recent_latency + 0.2 * latency)
+        self.latencies.record(latency)
+        if baseline is not None and self._recent_latency > baseline * self.latency_tolerance:
+            self._decrease()
+        else:
+            self._set_limit(self._limit + self.increase / self._limit)
+
+    def _decrease(self):
+        self._last_decrease = time.monotonic()
+        self._recent_latency = None
+        self._set_limit(self._limit * self.decrease_factor)
+
+    def _set_limit(self, limit):
+        previous = int(self._limit)
+        self._limit = min(max(limit, self.min_limit), self.max_limit)
+        if int(self._limit) != previous:
+            self._history.append((time.time(), int(self._limit)))
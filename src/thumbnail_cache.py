@@ -0,0 +1,219 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict, deque
+
+from PIL import Image
+
+DEFAULT_THUMBNAIL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "journal_transcriber", "thumbnails")
+DEFAULT_THUMBNAIL_SIZE = (128, 128)
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+EVICT_TO = 0.8  # Eviction goes down to this share of max_disk_bytes, so it runs rarely
+
+
+class ThumbnailCache:
+    """
+    Thumbnails of image files, in memory and on disk.
+
+    Lookups go through an in-memory LRU of up to memory_items PIL images,
+    then a directory of small JPEGs, and only then decode the source image.
+    Entries are keyed by the file's absolute path, size and mtime plus the
+    thumbnail size, so an edited image gets a new thumbnail while stale
+    ones are simply never read again. The directory is kept under
+    max_disk_bytes by deleting the least recently used files (by mtime,
+    which disk hits refresh). Safe to use from several threads.
+    """
+
+    def __init__(self, directory=DEFAULT_THUMBNAIL_DIR, size=DEFAULT_THUMBNAIL_SIZE, memory_items=1000,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.size = tuple(size)
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._disk_bytes = None  # Size of the cached files, counted on the first save
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, path, size):
+        stat = os.stat(path)
+        identity = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{size[0]}x{size[1]}"
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def peek(self, path, size=None):
+        """Return the thumbnail if it is in memory, else None; never touches the disk beyond a stat"""
+        try:
+            key = self._key(path, size or self.size)
+        except OSError:
+            return None
+        with self._lock:
+            img = self._memory.get(key)
+            if img is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            return img
+
+    def get(self, path, size=None):
+        """
+        Return a thumbnail of path fitting within size (default: self.size)
+
+        Raises:
+            OSError: If the file can't be read or decoded
+        """
+        size = tuple(size or self.size)
+        key = self._key(path, size)
+        with self._lock:
+            img = self._memory.get(key)
+            if img is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return img
+
+        cache_path = os.path.join(self.directory, key[:2], f"{key}.jpg")
+        try:
+            with Image.open(cache_path) as cached:
+                img = cached.copy()
+            disk_hit = True
+            self._touch(cache_path)
+        except (OSError, ValueError):
+            img = self._generate(path, size)
+            self._save(img, cache_path)
+            disk_hit = False
+
+        with self._lock:
+            if disk_hit:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            self._memory[key] = img
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+        return img
+
+    @staticmethod
+    def _generate(path, size):
+        try:
+            with Image.open(path) as img:
+                # JPEGs decode straight at a reduced scale; thumbnail() finishes the resize
+                img.draft('RGB', (size[0] * 2, size[1] * 2))
+                img = img.convert('RGB')
+        except Image.DecompressionBombError as e:
+            raise OSError(str(e)) from None
+        img.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        return img
+
+    def _save(self, img, cache_path):
+        # Write then rename, so a concurrent reader never sees half a file
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        try:
+            img.save(tmp_path, 'JPEG', quality=85)
+            os.replace(tmp_path, cache_path)
+            self._account(os.path.getsize(cache_path))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _touch(cache_path):
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+
+    def _account(self, added):
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += added
+            if self.max_disk_bytes and self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _disk_files(self):
+        """(mtime, size, path) of every cached thumbnail"""
+        files = []
+        for subdir in os.scandir(self.directory):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith('.jpg'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue  # Evicted by another process
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _evict(self):
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * EVICT_TO
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+
+class ThumbnailLoader:
+    """
+    Background threads filling a ThumbnailCache for whatever is on screen.
+
+    request() replaces the pending work with the given paths, so scrolling
+    quickly past thousands of files only loads the ones still visible.
+    on_ready(path, image or None) is called on a loader thread for each
+    finished thumbnail (None if the file could not be read); GUI callers
+    should hand it to their own thread, e.g. through a queue.
+    """
+    def __init__(self, cache, on_ready, workers=2):
+        self.cache = cache
+        self.on_ready = on_ready
+        self._pending = deque()
+        self._wanted = set()
+        self._closed = False
+        self._condition = threading.Condition()
+        self._threads = [threading.Thread(target=self._run, name=f"thumbnails-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def request(self, paths):
+        """Load these paths, in order, dropping anything requested earlier and not yet started"""
+        with self._condition:
+            self._pending = deque(paths)
+            self._wanted = set(self._pending)
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                path = self._pending.popleft()
+            try:
+                img = self.cache.get(path)
+            except OSError:
+                img = None
+            with self._condition:
+                if self._closed:
+                    return
+                wanted = path in self._wanted
+            if wanted:
+                self.on_ready(path, img)
@@ -0,0 +1,238 @@
+"""
+Full-text index over transcription outputs.
+
+Usage:
+    python src/transcript_index.py update uploads/ -r
+    python src/transcript_index.py search alice "went to the park" --from 2021-01-01 --to 2021-12-31
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+from collections import namedtuple
+
+from date_extractor import extract_dates_batch
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".cache", "journal_transcriber", "index.sqlite3")
+
+SearchHit = namedtuple('SearchHit', ['path', 'date', 'snippet', 'rank'])
+
+
+def _fts_phrase(text):
+    # Quote as an FTS5 string so punctuation and keywords (AND, NEAR, ...) are taken literally
+    return '"' + text.replace('"', '""') + '"'
+
+
+class TranscriptIndex:
+    """
+    Incremental full-text index of transcription .txt files in SQLite FTS5.
+
+    The text lives once, in the documents table, together with the date of
+    the entry and the file's size/mtime; the FTS5 table only holds the
+    inverted index over it (external content). Adding a file again replaces
+    its postings in place, so the index can be kept current as each
+    transcription is written.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " id INTEGER PRIMARY KEY,"
+            " path TEXT NOT NULL UNIQUE,"
+            " date TEXT,"
+            " source TEXT,"
+            " size INTEGER,"
+            " mtime_ns INTEGER,"
+            " text TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_date ON documents (date)")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS transcripts USING fts5("
+            " text, content='documents', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        self._conn.commit()
+
+    def add(self, path, text, date=None, source=None):
+        """
+        Index (or re-index) one transcription file
+
+        Args:
+            path: Path of the .txt output
+            text: Its contents
+            date: YYYY-MM-DD of the entry, if known
+            source: Path of the image it was transcribed from, if known
+        """
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size, mtime_ns = None, None
+
+        with self._lock:
+            self._delete(path)
+            cursor = self._conn.execute(
+                "INSERT INTO documents (path, date, source, size, mtime_ns, text) VALUES (?, ?, ?, ?, ?, ?)",
+                (path, date, source, size, mtime_ns, text),
+            )
+            self._conn.execute("INSERT INTO transcripts (rowid, text) VALUES (?, ?)", (cursor.lastrowid, text))
+            self._conn.commit()
+
+    def add_file(self, path):
+        """
+        Index a .txt file from disk unless it is unchanged since it was last indexed
+
+        Returns:
+            bool: True if the file was (re-)indexed
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns FROM documents WHERE path = ?", (path,)
+            ).fetchone()
+        if row == (stat.st_size, stat.st_mtime_ns):
+            return False
+
+        with open(path, encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        self.add(path, text, extract_dates_batch([text])[0])
+        return True
+
+    def remove(self, path):
+        with self._lock:
+            self._delete(os.path.abspath(path))
+            self._conn.commit()
+
+    def _delete(self, path):
+        row = self._conn.execute("SELECT id, text FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        # External-content FTS5 tables need the old text to remove its postings
+        self._conn.execute("INSERT INTO transcripts (transcripts, rowid, text) VALUES ('delete', ?, ?)", row)
+        self._conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+
+    def update_folder(self, folder, recursive=False):
+        """
+        Bring the index up to date with the .txt files in a folder: new and
+        changed files are indexed, entries for deleted files are dropped.
+
+        Returns:
+            tuple: (files indexed, entries removed)
+        """
+        folder = os.path.abspath(folder)
+        on_disk = set()
+        for dirpath, dirnames, filenames in os.walk(folder):
+            on_disk.update(os.path.join(dirpath, name) for name in filenames if name.lower().endswith('.txt'))
+            if not recursive:
+                break
+
+        indexed = sum(1 for path in sorted(on_disk) if self.add_file(path))
+
+        with self._lock:
+            known = [path for (path,) in self._conn.execute("SELECT path FROM documents")]
+        removed = 0
+        for path in known:
+            parent = os.path.dirname(path)
+            in_scope = parent == folder or (recursive and parent.startswith(folder + os.sep))
+            # Entries that aren't .txt files (e.g. journal store entries) are left alone
+            if in_scope and path.endswith('.txt') and path not in on_disk:
+                self.remove(path)
+                removed += 1
+        return indexed, removed
+
+    def search(self, terms=(), phrases=(), date_from=None, date_to=None, limit=50):
+        """
+        Find transcriptions containing every term and phrase, optionally
+        limited to entries dated within [date_from, date_to] (YYYY-MM-DD).
+        With no terms or phrases, every entry in the date range matches.
+
+        Returns:
+            list[SearchHit]: Best matches first, or by date without a text query
+        """
+        match = ' '.join(_fts_phrase(item) for item in (*terms, *phrases) if item.strip())
+        conditions, params = [], []
+        if date_from:
+            conditions.append("d.date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("d.date <= ?")
+            params.append(date_to)
+
+        if match:
+            sql = ("SELECT d.path, d.date, snippet(transcripts, 0, '[', ']', '...', 12), bm25(transcripts)"
+                   " FROM transcripts JOIN documents d ON d.id = transcripts.rowid"
+                   " WHERE transcripts MATCH ?")
+            params.insert(0, match)
+            order = " ORDER BY bm25(transcripts)"
+        else:
+            sql = "SELECT d.path, d.date, substr(d.text, 1, 80), 0 FROM documents d WHERE 1"
+            order = " ORDER BY d.date, d.path"
+        for condition in conditions:
+            sql += f" AND {condition}"
+        sql += order + " LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [SearchHit(*row) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            documents, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(text)), 0) FROM documents"
+            ).fetchone()
+        return {"documents": documents, "text_bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index and search transcription outputs.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH,
+                        help=f"Index database (default: {DEFAULT_INDEX_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    update = commands.add_parser("update", help="Index new and changed .txt files in folders")
+    update.add_argument("folders", nargs="+")
+    update.add_argument("-r", "--recursive", action="store_true", help="Recurse into sub-directories")
+
+    search = commands.add_parser("search", help="Search indexed transcriptions")
+    search.add_argument("terms", nargs="*",
+                        help="Words that must all appear; a quoted multi-word argument is a phrase")
+    search.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD", help="Earliest entry date")
+    search.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD", help="Latest entry date")
+    search.add_argument("-n", "--limit", type=int, default=50, help="Maximum results (default: 50)")
+    args = parser.parse_args(argv)
+
+    index = TranscriptIndex(args.index)
+    try:
+        if args.command == "update":
+            for folder in args.folders:
+                indexed, removed = index.update_folder(folder, args.recursive)
+                print(f"{folder}: {indexed} indexed, {removed} removed")
+            return 0
+
+        phrases = [term for term in args.terms if ' ' in term.strip()]
+        terms = [term for term in args.terms if ' ' not in term.strip()]
+        hits = index.search(terms, phrases, args.date_from, args.date_to, args.limit)
+        for hit in hits:
+            print(f"{hit.date or '----------'}  {hit.path}\n    {' '.join(hit.snippet.split())}")
+        print(f"{len(hits)} matches")
+        return 0
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "journal_transcriber", "transcriptions.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256MB of transcribed text
+
+
+class TranscriptionCache:
+    """
+    Persistent, content-addressed cache of transcriptions stored in SQLite.
+
+    Entries are keyed by a hash of the processed image bytes, the prompt and
+    the model name, so re-running the same page costs no API call. When the
+    stored text exceeds max_bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcriptions ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS transcriptions_last_access ON transcriptions (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(image_bytes, prompt, model_name):
+        """
+        Build the cache key from the processed image bytes, prompt text and model name
+        """
+        digest = hashlib.sha256()
+        for part in (model_name.encode(), prompt.encode(), image_bytes):
+            # Length-prefix each part so different splits can't collide
+            digest.update(len(part).to_bytes(8, 'big'))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Return the cached transcription for key, or None on a miss
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM transcriptions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE transcriptions SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key, text):
+        """
+        Store a transcription and evict least recently used entries over the size cap
+        """
+        size = len(text.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcriptions (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcriptions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM transcriptions ORDER BY last_access")
+        to_delete = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM transcriptions WHERE key = ?", to_delete)
+
+    def stats(self):
+        """
+        Return hit/miss counters and current cache size
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcriptions"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
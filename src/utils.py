@@ -1,30 +1,122 @@
+import io
+import math
 import os
 from PIL import Image
+from metrics import metrics
+
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB in bytes
+
+
+class ImageHandle:
+    """
+    A single image file shared by validation, preview and preprocessing.
+
+    The file is read once; header info (format, size, mode) is parsed without
+    decoding pixels. The decoded image and derived products such as the preview
+    thumbnail are created on first use and cached, so each stage reuses them
+    instead of opening the file again. JPEGs are decoded at the smallest DCT
+    scale that still covers the size a stage asks for.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = f.read()
+
+        with self.open() as img:
+            self.format = img.format
+            self.size = img.size
+            self.mode = img.mode
+
+        self._image = None
+        self._thumbnails = {}
+        self.prepared = None  # PreparedImage, set by ImageProcessor.prepare_image
+
+    @property
+    def file_size(self):
+        return len(self.data)
+
+    def open(self):
+        """Return a new, not yet decoded PIL image over the file bytes"""
+        return Image.open(io.BytesIO(self.data))
+
+    @property
+    def image(self):
+        """The decoded image at full resolution"""
+        return self.decode()
+
+    def decode(self, max_dimension=None):
+        """
+        Return the decoded image with its longest side at least max_dimension
+        (or at full resolution when max_dimension is None).
+
+        JPEGs use draft mode, so the decoder itself scales down by 1/2, 1/4 or 1/8
+        when that still leaves enough pixels; callers finish with a proper resize.
+        A previously decoded image is reused whenever it is large enough.
+        """
+        full_dimension = max(self.size)
+        needed = full_dimension if max_dimension is None else min(max_dimension, full_dimension)
+        if self._image is not None and max(self._image.size) >= needed:
+            return self._image
+
+        img = self.open()
+        if needed < full_dimension:
+            scale = needed / full_dimension
+            # No-op for formats without reduced-resolution decoding (e.g. PNG)
+            img.draft(img.mode, (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+        img.load()
+        self._image = img
+        return img
+
+    def thumbnail(self, size=(300, 300)):
+        """Return a cached thumbnail that fits within size"""
+        if size not in self._thumbnails:
+            img = self.decode(max(size))
+            if img.width > size[0] or img.height > size[1]:
+                ratio = min(size[0] / img.width, size[1] / img.height)
+                new_size = (max(1, round(img.width * ratio)), max(1, round(img.height * ratio)))
+                img = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            self._thumbnails[size] = img
+        return self._thumbnails[size]
+
 
 def validate_image_file(file_path):
     """
     Validate that the file is a supported image file
+
+    Args:
+        file_path: Path to the image, or an ImageHandle already loaded for it
+
+    Returns:
+        ImageHandle: Handle to pass on to the preview and preprocessing stages
     """
-    if not os.path.exists(file_path):
-        raise ValueError("File does not exist")
-
-    # Check file extension
-    valid_extensions = {'.jpg', '.jpeg', '.png'}
-    file_ext = os.path.splitext(file_path)[1].lower()
-    
-    if file_ext not in valid_extensions:
-        raise ValueError(f"Unsupported file format. Supported formats: {', '.join(valid_extensions)}")
-
-    # Try opening the image to verify it's valid
-    try:
-        with Image.open(file_path) as img:
-            img.verify()
-    except Exception:
-        raise ValueError("Invalid or corrupted image file")
-
-    # Check file size (max 10MB)
-    max_size = 10 * 1024 * 1024  # 10MB in bytes
-    if os.path.getsize(file_path) > max_size:
-        raise ValueError("Image file is too large (maximum size: 10MB)")
-
-    return True
+    handle = file_path if isinstance(file_path, ImageHandle) else None
+    if handle is not None:
+        file_path = handle.path
+
+    with metrics.span('validate', source=file_path) as span:
+        if handle is None and not os.path.exists(file_path):
+            raise ValueError("File does not exist")
+
+        # Check file extension
+        valid_extensions = {'.jpg', '.jpeg', '.png'}
+        file_ext = os.path.splitext(file_path)[1].lower()
+
+        if file_ext not in valid_extensions:
+            raise ValueError(f"Unsupported file format. Supported formats: {', '.join(valid_extensions)}")
+
+        # Check file size (max 10MB) before reading the file into memory
+        file_size = handle.file_size if handle is not None else os.path.getsize(file_path)
+        if file_size > MAX_FILE_SIZE:
+            raise ValueError("Image file is too large (maximum size: 10MB)")
+
+        # Try opening the image to verify it's valid
+        try:
+            if handle is None:
+                handle = ImageHandle(file_path)
+            with handle.open() as img:
+                img.verify()
+        except Exception:
+            raise ValueError("Invalid or corrupted image file")
+
+        span.set(file_size=file_size, width=handle.size[0], height=handle.size[1])
+        return handle
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+
+from api_client import DEFAULT_PACK_TOKEN_BUDGET
+from batch import collect_image_files, index_output, make_prepare_pool, run_batch
+from manifest import DONE, FAILED, file_digest
+
+
+class FolderWatcher:
+    """
+    Polls folders for new or changed images and transcribes them with
+    run_batch, recording every outcome in a Manifest.
+
+    A scan only stats each file. An image is hashed when its size or mtime
+    differs from the manifest, and transcribed again only if its contents
+    changed as well. Outputs are added to `index` (a TranscriptIndex), if
+    given, as they are written. With a JournalStore, each entry is
+    committed before the manifest records the image as done. A changed
+    image's previous output is only removed once its new transcription has
+    been written, so a failed retry never loses the old one. Files modified
+    within the last settle_seconds are left for the next scan, since they
+    may still be being copied in. A failed image is not retried until it
+    changes or the watcher is restarted. With prepare_processes, one pool of
+    preparing processes is started on first use and kept until close().
+    """
+    def __init__(self, folders, api_client, image_processor, manifest, output_dir=None,
+                 recursive=False, workers=4, pack_size=1, token_budget=DEFAULT_PACK_TOKEN_BUDGET,
+                 settle_seconds=2.0, prepare_processes=0, index=None, store=None, log=print):
+        self.folders = list(folders)
+        self.api_client = api_client
+        self.image_processor = image_processor
+        self.manifest = manifest
+        self.output_dir = output_dir
+        self.recursive = recursive
+        self.workers = workers
+        self.pack_size = pack_size
+        self.token_budget = token_budget
+        self.settle_seconds = settle_seconds
+        self.prepare_processes = prepare_processes
+        self.index = index
+        self.store = store
+        self.log = log
+        self.succeeded = 0
+        self.failures = []  # (path, error) across all scans
+        self._failed = {}  # path -> (size, mtime_ns) of versions that failed during this run
+        self._prepare_pool = None
+
+    def scan(self):
+        """
+        Find images that need transcribing.
+
+        Returns:
+            list: (path, os.stat_result, sha256) for each new or changed image
+        """
+        pending = []
+        now = time.time()
+        for path in collect_image_files(self.folders, self.image_processor.supported_formats, self.recursive):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Removed since the directory listing
+            version = (stat.st_size, stat.st_mtime_ns)
+            if self._failed.get(path) == version:
+                continue
+
+            entry = self.manifest.get(path)
+            if entry and entry.status == DONE and entry.matches_stat(stat):
+                continue
+            if now - stat.st_mtime < self.settle_seconds:
+                continue
+
+            sha256 = file_digest(path)
+            if entry and entry.status == DONE and entry.sha256 == sha256:
+                # Touched or copied over with identical contents; remember the new stat
+                self.manifest.record(path, stat, sha256, DONE, output=entry.output)
+                continue
+            pending.append((path, stat, sha256))
+        return pending
+
+    def run_once(self):
+        """
+        Scan once and transcribe whatever is new or changed.
+
+        Returns:
+            tuple: (number succeeded, list of (path, error) for failures)
+        """
+        pending = self.scan()
+        if not pending:
+            return 0, []
+
+        versions = {path: (stat, sha256) for path, stat, sha256 in pending}
+
+        def on_result(path, output_path, error):
+            stat, sha256 = versions[path]
+            if error is None:
+                if self.store:
+                    self.store.flush()
+                self._remove_stale_output(path, output_path)
+                self._failed.pop(path, None)
+                self.manifest.record(path, stat, sha256, DONE, output=output_path)
+                if self.index:
+                    index_output(self.index, output_path, self.store)
+            else:
+                self._failed[path] = (stat.st_size, stat.st_mtime_ns)
+                # Keep pointing at the previous output, which is still on disk
+                previous = self.manifest.get(path)
+                self.manifest.record(path, stat, sha256, FAILED, output=previous.output if previous else None,
+                                     error=str(error))
+
+        self.log(f"Found {len(pending)} new or changed images")
+        if self.prepare_processes and self._prepare_pool is None:
+            self._prepare_pool = make_prepare_pool(self.image_processor, self.prepare_processes)
+        succeeded, failures, _ = run_batch(
+            [path for path, _, _ in pending], self.api_client, self.image_processor,
+            self.workers, self.output_dir, log=self.log,
+            pack_size=self.pack_size, token_budget=self.token_budget, on_result=on_result,
+            prepare_processes=self.prepare_processes, store=self.store, prepare_pool=self._prepare_pool,
+        )
+        self.succeeded += succeeded
+        self.failures.extend(failures)
+        return succeeded, failures
+
+    def run(self, interval=5.0, stop_event=None):
+        """
+        Poll every `interval` seconds until stop_event is set (or forever)
+        """
+        stop_event = stop_event or threading.Event()
+        try:
+            while not stop_event.is_set():
+                self.run_once()
+                stop_event.wait(interval)
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop the preparing processes, if any were started"""
+        if self._prepare_pool is not None:
+            self._prepare_pool.shutdown()
+            self._prepare_pool = None
+
+    def _remove_stale_output(self, path, new_output):
+        # The image changed and its new transcription is written, so the previous
+        # one no longer applies. A journal store keeps it, marked superseded.
+        entry = self.manifest.get(path)
+        if not (entry and entry.output) or entry.output == new_output:
+            return
+        if self.index:
+            self.index.remove(entry.output)
+        if not self.store and os.path.exists(entry.output):
+            os.remove(entry.output)
+            self.log(f"{path} changed, removed old output {entry.output}")
@@ -0,0 +1,43 @@
+import time
+
+from rate_limiter import AdaptiveConcurrencyLimiter
+
+
+def test_adaptive_limiter_increases_on_success():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=4)
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(time.monotonic() - 0.1)  # A steady 100ms per request
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+    assert [limit for _, limit in limiter.history()] == [2, 3, 4]
+
+
+def test_adaptive_limiter_halves_on_throttle():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+    first, second = limiter.acquire(), limiter.acquire()
+    limiter.release(first, succeeded=False, throttled=True)
+    assert limiter.limit == 4
+    # Sent before the cut: only frees its slot
+    limiter.release(second, succeeded=False, throttled=True)
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+
+def test_adaptive_limiter_decreases_on_latency_spike():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, latency_tolerance=2.0)
+    now = time.monotonic()
+    limiter.acquire()
+    limiter.release(now - 0.01)
+    limit = limiter.limit
+    limiter.acquire()
+    limiter.release(now - 10.0)
+    assert limiter.limit == limit // 2
+
+
+def test_adaptive_limiter_respects_bounds():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=100, min_limit=2, max_limit=10)
+    assert limiter.limit == 10
+    for _ in range(5):
+        limiter.release(limiter.acquire(), succeeded=False, throttled=True)
+    assert limiter.limit == 2
@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from api_client import MODEL_NAME, GeminiAPIClient, TranscriptionAPIError, _close_model, _make_model
+from fake_backend import FakeGeminiModel, FakeResponse
+from hedging import HedgePolicy
+from image_processor import PreparedImage
+from rate_limiter import THROTTLED, AdaptiveConcurrencyLimiter, CircuitBreaker, RetryPolicy
+
+TEXTS = ("March 3, 2021\n\nFirst page", "2021-04-17\n\nSecond page", "Third page")
+
+
+class ScriptedModel:
+    """FakeGeminiModel that raises the given errors first, or answers packed requests with packed_text"""
+    def __init__(self, failures=(), packed_text=None, fail_stream_after=None):
+        self.fake = FakeGeminiModel("const:0", transcripts=TEXTS, stream_chunks=4)
+        self.failures = list(failures)
+        self.packed_text = packed_text
+        self.fail_stream_after = fail_stream_after
+        self.calls = []
+
+    def generate_content(self, contents, stream=False, generation_config=None, **kwargs):
+        self.calls.append(sum(1 for part in contents if not isinstance(part, str)))
+        if self.failures:
+            raise self.failures.pop(0)
+        if generation_config and self.packed_text is not None:
+            return FakeResponse(self.packed_text)
+        response = self.fake.generate_content(contents, stream=stream, generation_config=generation_config)
+        if stream and self.fail_stream_after is not None:
+            return self._failing_stream(response)
+        return response
+
+    def _failing_stream(self, response):
+        for index, chunk in enumerate(response):
+            if index == self.fail_stream_after:
+                raise google_exceptions.ServiceUnavailable("503 Stream reset")
+            yield chunk
+
+
+def _page(number):
+    return PreparedImage(b"page %d" % number, "image/jpeg", (800, 1000), source_path=f"page{number}.jpg")
+
+
+def _client(model, **kwargs):
+    kwargs.setdefault("retry_policy", RetryPolicy(max_attempts=3, base_delay=0.01))
+    return GeminiAPIClient(model=model, **kwargs)
+
+
+def test_retries_a_throttled_request():
+    model = ScriptedModel(failures=[google_exceptions.ResourceExhausted("429 Quota exceeded")])
+    client = _client(model)
+    assert client.transcribe_image(_page(1)) == TEXTS[0]
+    assert model.calls == [1, 1]
+    assert not client.circuit_breaker.is_open
+
+
+def test_gives_up_on_a_fatal_error():
+    model = ScriptedModel(failures=[google_exceptions.InvalidArgument("400 Bad image")])
+    with pytest.raises(TranscriptionAPIError):
+        _client(model).transcribe_image(_page(1))
+    assert model.calls == [1]
+
+
+def test_repeated_throttling_opens_the_breaker():
+    model = ScriptedModel(failures=[google_exceptions.ResourceExhausted("429")] * 3)
+    client = _client(model, circuit_breaker=CircuitBreaker(failure_threshold=3, cooldown=30.0))
+    with pytest.raises(TranscriptionAPIError) as raised:
+        client.transcribe_image(_page(1))
+    assert raised.value.kind == THROTTLED
+    assert model.calls == [1, 1, 1]
+    assert client.circuit_breaker.is_open
+    assert client.circuit_breaker.trips == 1
+
+
+def test_packed_request():
+    model = ScriptedModel()
+    assert _client(model).transcribe_images_packed([_page(1), _page(2), _page(3)], pack_size=3) == list(TEXTS)
+    assert model.calls == [3]
+
+
+def test_packed_response_with_wrong_page_count_falls_back_to_single_pages():
+    model = ScriptedModel(packed_text='["March 3, 2021\\n\\nFirst page and second page"]')
+    texts = _client(model).transcribe_images_packed([_page(1), _page(2)], pack_size=2)
+    assert texts == list(TEXTS[:2])
+    assert model.calls == [2, 1, 1]
+
+
+def test_stream_failing_midway_releases_its_slot():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2)
+    client = _client(ScriptedModel(fail_stream_after=2), concurrency_limiter=limiter)
+    chunks = []
+    with pytest.raises(TranscriptionAPIError):
+        for chunk in client.transcribe_image_stream(_page(1)):
+            chunks.append(chunk)
+    assert len(chunks) == 2
+    assert limiter.in_flight == 0
+
+
+def test_abandoned_stream_releases_its_slot():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2)
+    stream = _client(ScriptedModel(), concurrency_limiter=limiter).transcribe_image_stream(_page(1))
+    next(stream)
+    assert limiter.in_flight == 1
+    stream.close()
+    assert limiter.in_flight == 0
+
+
+def _warm_hedge_policy(latency):
+    policy = HedgePolicy(min_delay=0.05, max_hedge_rate=1.0)
+    for _ in range(policy.min_samples):
+        policy.record_result(latency)
+    return policy
+
+
+def test_hedging_does_not_limit_requests_in_flight():
+    client = _client(FakeGeminiModel("const:0.2"), max_concurrency=2, hedge_policy=_warm_hedge_policy(0.2))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(16) as executor:
+        list(executor.map(client.transcribe_image, [_page(number) for number in range(16)]))
+    # All 16 run at once; an executor of max_concurrency threads would need several rounds
+    assert time.perf_counter() - started < 0.5
+    client.close()
+
+
+def test_hedge_answers_a_slow_request():
+    model = SlowFirstModel(first_latency=2.0)
+    client = _client(model, hedge_policy=_warm_hedge_policy(0.05))
+    started = time.perf_counter()
+    assert client.transcribe_image(_page(1)) == TEXTS[0]
+    assert time.perf_counter() - started < 1.0
+    assert client.hedge_policy.stats()["wins"] == 1
+    client.close()
+    assert client._hedge_executor is None
+
+
+class SlowFirstModel:
+    """The first request takes first_latency seconds, later ones answer at once"""
+    def __init__(self, first_latency):
+        self.fake = FakeGeminiModel("const:0", transcripts=TEXTS[:1])
+        self.first_latency = first_latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, **kwargs):
+        with self._lock:
+            self.requests += 1
+            first = self.requests == 1
+        if first:
+            time.sleep(self.first_latency)
+        return self.fake.generate_content(contents, **kwargs)
+
+
+# _make_model relies on private parts of google-generativeai (pinned below 0.9
+# in pyproject.toml); these fail loudly if an SDK release moves them
+
+def test_sdk_model_still_has_the_client_attributes():
+    from google.generativeai import GenerativeModel
+    from google.generativeai import client as genai_client
+
+    model = GenerativeModel(MODEL_NAME)
+    assert model._client is None
+    assert model._async_client is None
+    assert callable(genai_client._ClientManager().configure)
+    assert callable(genai_client._ClientManager().make_client)
+
+
+def test_make_model_uses_its_own_key_on_a_thread_without_event_loop():
+    from google.generativeai import client as genai_client
+
+    made = []
+    thread = threading.Thread(target=lambda: made.append(_make_model("key-a", MODEL_NAME)))
+    thread.start()
+    thread.join()
+    [(model, clients)] = made
+    assert model._client.transport._credentials.token == "key-a"
+    assert model._async_client is None  # Made on first async use, on the event loop's thread
+    assert genai_client._client_manager.client_config["client_options"].api_key is None
+    _close_model(model)
+
+
+def test_async_client_uses_the_clients_key():
+    client = GeminiAPIClient(api_key="key-b")
+
+    async def make_async_client():
+        client._use_async_client()
+        return client.model._async_client
+
+    assert asyncio.run(make_async_client()).transport._credentials.token == "key-b"
+    client.close()
@@ -0,0 +1,40 @@
+import pytest
+from google.api_core import exceptions as google_exceptions
+from PIL import Image
+
+from api_client import GeminiAPIClient
+from batch import run_pdf
+from fake_backend import FakeGeminiModel
+from image_processor import ImageProcessor
+from pdf_source import page_source
+
+pytest.importorskip("pypdfium2")
+
+
+class FailingRequestModel(FakeGeminiModel):
+    """Answers like FakeGeminiModel, except request number fail_request fails for good"""
+    def __init__(self, fail_request, **kwargs):
+        super().__init__("const:0", **kwargs)
+        self.fail_request = fail_request
+
+    def generate_content(self, contents, **kwargs):
+        if self.stats["requests"] + 1 == self.fail_request:
+            self.stats["requests"] += 1
+            raise google_exceptions.InvalidArgument("400 Bad page")
+        return super().generate_content(contents, **kwargs)
+
+
+@pytest.fixture
+def notebook(tmp_path):
+    path = str(tmp_path / "notebook.pdf")
+    pages = [Image.new("RGB", (600, 800), "white") for _ in range(3)]
+    pages[0].save(path, save_all=True, append_images=pages[1:])
+    return path
+
+
+def test_run_pdf_reports_a_failed_page_by_its_page(notebook, tmp_path):
+    client = GeminiAPIClient(model=FailingRequestModel(fail_request=2))
+    succeeded, failures, _ = run_pdf(notebook, client, ImageProcessor(), workers=1,
+                                     output_dir=str(tmp_path), log=lambda message: None)
+    assert succeeded == 2
+    assert [path for path, _ in failures] == [page_source(notebook, 2)]
@@ -0,0 +1,77 @@
+import pytest
+
+from date_extractor import IncrementalDateExtractor, extract_date, extract_dates_batch, find_dates
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2021-04-17\n\nDinner with friends.", "2021-04-17"),
+    ("2021/4/7 rainy", "2021-04-07"),
+    ("25/12/2021 Christmas", "2021-12-25"),
+    ("12/25/2021 Christmas", "2021-12-25"),  # Only valid as MM/DD
+    ("March 3, 2021\n\nWent for a walk.", "2021-03-03"),
+    ("Sept. 30th, 2021", "2021-09-30"),
+    ("dec 1 2020", "2020-12-01"),
+])
+def test_extract_date_formats(text, expected):
+    assert extract_date(text) == expected
+
+
+def test_extract_date_prefers_iso_then_earliest():
+    assert extract_date("March 3, 2021 and later 2021-05-01") == "2021-05-01"
+    assert extract_date("01/02/2021 then 03/04/2021") == "2021-02-01"
+
+
+@pytest.mark.parametrize("text", [
+    "No date on this page",
+    "2021-02-30",  # No such day
+    "2021-02-29",  # Not a leap year
+    "Sunday 3, 2021",  # Not a month name
+    "12021-01-01",  # Part of a longer number
+    "March" + " " * 6 + "3, 2021",  # Too far apart to be one date
+])
+def test_extract_date_rejects(text):
+    with pytest.raises(ValueError):
+        extract_date(text)
+
+
+def test_leap_day():
+    assert extract_date("2020-02-29") == "2020-02-29"
+    assert extract_date("2000-02-29") == "2000-02-29"
+    with pytest.raises(ValueError):
+        extract_date("1900-02-29")
+
+
+def test_find_dates_positions():
+    text = "From 2021-01-02 to 2021-01-05"
+    dates = find_dates(text)
+    assert [d.date for d in dates] == ["2021-01-02", "2021-01-05"]
+    assert text[dates[1].start:dates[1].end] == "2021-01-05"
+
+
+def test_extract_dates_batch():
+    assert extract_dates_batch(["2021-01-02", "nothing", "May 5, 2019"]) == ["2021-01-02", None, "2019-05-05"]
+
+
+def test_incremental_holds_back_a_date_at_the_end():
+    dates = IncrementalDateExtractor()
+    assert dates.feed("Entry 2021-05-1") is None
+    assert dates.feed("2, a good day") == "2021-05-12"
+    assert dates.finish() == "2021-05-12"
+    assert dates.text == "Entry 2021-05-12, a good day"
+
+
+@pytest.mark.parametrize("text", [
+    "March 3, 2021\n\nWent for a long walk. On 2021-04-17 it rained.",
+    "Nothing dated here at all",
+    "notes 25/12/2021 and then September 30th, 2021 was the end",
+    "Entry September" + " " * 25 + "30, 2021 x",
+    "Dear diary\nMarch" + "\n" * 30 + "3, 2021",
+    "Entry September.     30th,     2021",
+])
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 50])
+def test_incremental_matches_extract_date(text, chunk_size):
+    dates = IncrementalDateExtractor()
+    for start in range(0, len(text), chunk_size):
+        dates.feed(text[start:start + chunk_size])
+    assert dates.finish() == extract_dates_batch([text])[0]
+    assert dates.text == text
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from fake_backend import FakeGeminiModel, parse_latency
+
+
+@pytest.mark.parametrize("spec, low, high", [
+    ("const:0.5", 0.5, 0.5),
+    ("uniform:1,2", 1.0, 2.0),
+    ("exp:1", 0.0, float("inf")),
+    ("lognormal:1.0,0.4", 0.0, float("inf")),
+])
+def test_parse_latency(spec, low, high):
+    sample = parse_latency(spec)
+    rng = random.Random(0)
+    for _ in range(100):
+        assert low <= sample(rng) <= high
+
+
+@pytest.mark.parametrize("spec", ["const", "const:a", "uniform:1", "gamma:1,2", ""])
+def test_parse_latency_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_latency(spec)
+
+
+def test_packed_request_gets_one_transcript_per_image():
+    model = FakeGeminiModel("const:0", transcripts=("one", "two"))
+    response = model.generate_content(["prompt", b"image", b"image"],
+                                      generation_config={"response_mime_type": "application/json"})
+    assert response.text == '["one", "two"]'
+    assert model.stats == {"requests": 1, "throttled": 0, "errors": 0}
+
+
+def test_stream_yields_the_whole_transcript():
+    model = FakeGeminiModel("const:0", transcripts=("March 3, 2021\n\nA walk",), stream_chunks=4)
+    chunks = [chunk.text for chunk in model.generate_content(["prompt", b"image"], stream=True)]
+    assert len(chunks) == 4
+    assert "".join(chunks) == "March 3, 2021\n\nA walk"
@@ -0,0 +1,56 @@
+from hedging import HedgePolicy, LatencyWindow
+
+
+def test_latency_window_percentile():
+    window = LatencyWindow(size=100)
+    assert window.percentile(50) is None
+    for seconds in range(1, 11):
+        window.record(float(seconds))
+    assert len(window) == 10
+    assert window.percentile(50) == 5.0
+    assert window.percentile(95) == 10.0
+    assert window.percentile(0) == 1.0
+
+
+def test_latency_window_keeps_most_recent():
+    window = LatencyWindow(size=3)
+    for seconds in (100.0, 1.0, 2.0, 3.0):
+        window.record(seconds)
+    assert len(window) == 3
+    assert window.percentile(100) == 3.0
+
+
+def test_no_hedge_before_min_samples():
+    policy = HedgePolicy(min_samples=5)
+    for _ in range(4):
+        policy.record_result(1.0)
+    assert policy.hedge_delay() is None
+    policy.record_result(1.0)
+    assert policy.hedge_delay() == 1.0
+
+
+def test_hedge_delay_has_a_floor():
+    policy = HedgePolicy(min_samples=1, min_delay=0.5)
+    policy.record_result(0.1)
+    assert policy.hedge_delay() == 0.5
+
+
+def test_hedge_rate_is_capped():
+    policy = HedgePolicy(max_hedge_rate=0.1)
+    for _ in range(20):
+        policy.record_request()
+    assert policy.try_hedge()
+    assert policy.try_hedge()
+    assert not policy.try_hedge()
+    for _ in range(10):
+        policy.record_request()
+    assert policy.try_hedge()
+    assert policy.stats()['hedges'] == 3
+
+
+def test_stats_count_wins():
+    policy = HedgePolicy(min_samples=1)
+    policy.record_request()
+    policy.record_result(2.0, hedge_won=True)
+    policy.record_result(1.0)
+    assert policy.stats() == {'requests': 1, 'hedges': 0, 'wins': 1, 'hedge_delay': 2.0}
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from journal_store import JournalStore
+from manifest import file_digest
+from pipeline import TranscriptionResult
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JournalStore(str(tmp_path / "journal.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_append_keeps_provenance(store, tmp_path):
+    source = tmp_path / "page.jpg"
+    source.write_bytes(b"scan")
+    entry_id = store.append(TranscriptionResult(str(source), "Text", "2021-03-03"), model="m", prompt="Transcribe")
+    entry = store.get(entry_id)
+    assert (entry.date, entry.transcription, entry.source, entry.model) == ("2021-03-03", "Text", str(source), "m")
+    assert entry.source_sha256 == file_digest(str(source))
+    assert store.prompt(entry.prompt_sha256) == "Transcribe"
+    assert not entry.superseded
+
+
+def test_same_date_entries_are_separate_rows(store):
+    store.append(TranscriptionResult("a.jpg", "Morning", "2021-03-03"))
+    store.append(TranscriptionResult("b.jpg", "Evening", "2021-03-03"))
+    assert [entry.transcription for entry in store.entries()] == ["Morning", "Evening"]
+    assert store.stats() == {"entries": 2, "dates": 1, "superseded": 0}
+
+
+def test_retranscribing_a_page_supersedes_it(store):
+    old = store.append(TranscriptionResult("scan.pdf", "Old", "2021-03-03", page=1))
+    store.append(TranscriptionResult("scan.pdf", "Other page", "2021-03-04", page=2))
+    new = store.append(TranscriptionResult("scan.pdf", "New", "2021-03-03", page=1))
+    assert store.get(old).superseded
+    assert [entry.id for entry in store.entries(date_to="2021-03-03")] == [new]
+    assert len(list(store.entries(include_superseded=True))) == 3
+
+
+def test_entries_in_date_order(store):
+    for date in ("2021-05-01", None, "2021-01-01", "2021-03-01"):
+        store.append(TranscriptionResult(f"{date}.jpg", "text", date))
+    assert [entry.date for entry in store.entries()] == [None, "2021-01-01", "2021-03-01", "2021-05-01"]
+    assert [entry.date for entry in store.entries("2021-02-01", "2021-04-01")] == ["2021-03-01"]
+
+
+def test_flush_commits_for_other_readers(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    store = JournalStore(path, commit_every=100, commit_interval=3600)
+    store.append(TranscriptionResult("a.jpg", "text", "2021-01-01"))
+    reader = JournalStore(path)
+    assert reader.stats()["entries"] == 0
+    store.flush()
+    assert reader.stats()["entries"] == 1
+    reader.close()
+    store.close()
+
+
+def test_entry_ref_round_trip(store):
+    assert JournalStore.ref_id(store.entry_ref(12)) == 12
+
+
+def test_export_directory(store, tmp_path):
+    store.append(TranscriptionResult("a.jpg", "Morning", "2021-03-03"))
+    store.append(TranscriptionResult("b.jpg", "Evening", "2021-03-03"))
+    store.append(TranscriptionResult("scans/c.pdf", "Undated", page=2))
+    destination = tmp_path / "export"
+    assert store.export(str(destination)) == 3
+    assert (destination / "2021-03-03.txt").read_text() == "Morning\n\nEvening"
+    assert (destination / "c_p002.txt").read_text() == "Undated"
+
+
+def test_export_jsonl(store, tmp_path):
+    store.append(TranscriptionResult("a.jpg", "Morning", "2021-03-03"), model="m")
+    destination = tmp_path / "journal.jsonl"
+    assert store.export(str(destination)) == 1
+    [line] = destination.read_text().splitlines()
+    assert json.loads(line)["transcription"] == "Morning"
+    assert json.loads(line)["model"] == "m"
@@ -0,0 +1,50 @@
+import os
+
+from pipeline import TranscriptionResult, group_entries, write_transcription
+
+
+def test_output_basename():
+    assert TranscriptionResult("/scans/page.jpg", "text", "2021-03-03").output_basename == "2021-03-03"
+    assert TranscriptionResult("/scans/page.jpg", "text").output_basename == "page"
+    assert TranscriptionResult("/scans/book.pdf", "text", page=7).output_basename == "book_p007"
+
+
+def test_write_transcription_never_overwrites(tmp_path):
+    paths = [write_transcription(TranscriptionResult("page.jpg", f"entry {i}", "2021-03-03"), str(tmp_path))
+             for i in range(3)]
+    assert [os.path.basename(path) for path in paths] == ["2021-03-03.txt", "2021-03-03_2.txt", "2021-03-03_3.txt"]
+    assert [open(path).read() for path in paths] == ["entry 0", "entry 1", "entry 2"]
+
+
+def test_write_transcription_defaults_to_source_folder(tmp_path):
+    source = str(tmp_path / "page.jpg")
+    assert write_transcription(TranscriptionResult(source, "text")) == str(tmp_path / "page.txt")
+
+
+def test_write_transcription_basename(tmp_path):
+    path = write_transcription(TranscriptionResult("page.jpg", "text"), str(tmp_path), basename="named")
+    assert path == str(tmp_path / "named.txt")
+
+
+def _page(number, text, date=None):
+    return "book.pdf", TranscriptionResult("book.pdf", text, date, page=number)
+
+
+def test_group_entries_merges_undated_pages():
+    pages = [_page(1, "cover"), _page(2, "Mon", "2021-03-01"), _page(3, "more"),
+             _page(4, "Tue", "2021-03-02"), _page(5, "end")]
+    entries = [result for _, result in group_entries(pages)]
+    assert [(entry.page, entry.date_str, entry.transcription) for entry in entries] == [
+        (1, None, "cover"),
+        (2, "2021-03-01", "Mon\n\nmore"),
+        (4, "2021-03-02", "Tue\n\nend"),
+    ]
+
+
+def test_group_entries_passes_failures_through():
+    error = RuntimeError("page 3 failed")
+    pages = [_page(1, "Mon", "2021-03-01"), ("book.pdf#3", error), _page(4, "more")]
+    outcomes = list(group_entries(pages))
+    assert outcomes[0] == ("book.pdf#3", error)
+    assert outcomes[1][1].transcription == "Mon\n\nmore"
+    assert len(outcomes) == 2
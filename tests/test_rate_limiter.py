@@ -0,0 +1,81 @@
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from rate_limiter import (FATAL, THROTTLED, TRANSIENT, CircuitBreaker, RetryPolicy, TokenBucket, classify_error,
+                          retry_after_hint)
+
+
+@pytest.mark.parametrize("error, expected", [
+    (google_exceptions.ResourceExhausted("429"), THROTTLED),
+    (google_exceptions.TooManyRequests("429"), THROTTLED),
+    (google_exceptions.ServiceUnavailable("503"), TRANSIENT),
+    (google_exceptions.DeadlineExceeded("504"), TRANSIENT),
+    (ConnectionResetError(), TRANSIENT),
+    (TimeoutError(), TRANSIENT),
+    (google_exceptions.InvalidArgument("400"), FATAL),
+    (ValueError("bad image"), FATAL),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+def test_retry_after_hint():
+    assert retry_after_hint(Exception("429 Quota exceeded. Please retry in 17.5s.")) == 17.5
+    assert retry_after_hint(Exception("retry_delay { seconds: 12 }")) == 12
+    assert retry_after_hint(Exception("429 Quota exceeded")) is None
+
+
+def test_token_bucket_try_acquire():
+    bucket = TokenBucket(60, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+def test_token_bucket_reserve_goes_into_debt():
+    bucket = TokenBucket(60, capacity=1)  # One token per second
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve() == pytest.approx(2.0, abs=0.05)
+
+
+def test_token_bucket_adjust():
+    bucket = TokenBucket(60, capacity=10)
+    bucket.adjust(-5)  # Refunds never exceed the capacity
+    assert bucket.try_acquire(10)
+    assert not bucket.try_acquire(1)
+    bucket.adjust(-3)
+    assert bucket.try_acquire(3)
+
+
+def test_retry_policy_delays():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    for attempt in range(10):
+        assert 0 <= policy.delay(attempt) <= min(5.0, 2 ** attempt)
+    assert 10.0 <= policy.delay(0, retry_after=10.0) <= 11.0
+
+
+def test_circuit_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=30.0)
+    breaker.record_throttle()
+    assert not breaker.is_open
+    breaker.record_throttle()
+    assert breaker.is_open
+    assert 29.0 < breaker.pause_remaining() <= 30.0
+    assert breaker.trips == 1
+
+
+def test_circuit_breaker_success_resets_failures():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_throttle()
+    breaker.record_success()
+    breaker.record_throttle()
+    assert not breaker.is_open
+
+
+def test_circuit_breaker_honors_retry_after():
+    breaker = CircuitBreaker(failure_threshold=5)
+    breaker.record_throttle(retry_after=10.0)
+    assert breaker.is_open
+    assert breaker.pause_remaining() <= 10.0
+    assert breaker.trips == 1
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from transcript_index import TranscriptIndex
+
+
+@pytest.fixture
+def index():
+    index = TranscriptIndex(":memory:")
+    yield index
+    index.close()
+
+
+def test_search_terms_and_phrases(index, tmp_path):
+    index.add(str(tmp_path / "a.txt"), "Went to the park with Alice", "2021-03-03")
+    index.add(str(tmp_path / "b.txt"), "Alice stayed home; the park was closed", "2021-04-01")
+    assert {os.path.basename(hit.path) for hit in index.search(["alice", "park"])} == {"a.txt", "b.txt"}
+    [hit] = index.search(phrases=["went to the park"])
+    assert os.path.basename(hit.path) == "a.txt"
+    assert hit.snippet == "[Went to the park] with Alice"
+
+
+def test_search_by_date(index, tmp_path):
+    for date in ("2021-01-01", "2021-06-01", "2022-01-01"):
+        index.add(str(tmp_path / f"{date}.txt"), "garden notes", date)
+    hits = index.search(["garden"], date_from="2021-01-01", date_to="2021-12-31")
+    assert sorted(hit.date for hit in hits) == ["2021-01-01", "2021-06-01"]
+    assert [hit.date for hit in index.search(date_from="2021-06-01")] == ["2021-06-01", "2022-01-01"]
+
+
+def test_search_is_literal(index, tmp_path):
+    # Quotes and query keywords are searched for as words, not parsed
+    index.add(str(tmp_path / "a.txt"), "cats AND dogs")
+    assert len(index.search(['"cats', "AND"])) == 1
+    assert len(index.search(["NEAR"])) == 0
+    assert len(index.search(phrases=["dogs AND cats"])) == 0
+
+
+def test_readding_replaces_postings(index, tmp_path):
+    path = str(tmp_path / "a.txt")
+    index.add(path, "first version")
+    index.add(path, "second version")
+    assert index.search(["first"]) == []
+    assert len(index.search(["second"])) == 1
+    assert index.stats()["documents"] == 1
+    index.remove(path)
+    assert index.search(["second"]) == []
+
+
+def test_update_folder(index, tmp_path):
+    (tmp_path / "2021-03-03.txt").write_text("March 3, 2021\n\nA walk in the rain")
+    (tmp_path / "notes.txt").write_text("no date")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "deep.txt").write_text("nested")
+    assert index.update_folder(str(tmp_path)) == (2, 0)
+    assert index.update_folder(str(tmp_path)) == (0, 0)  # Unchanged files are skipped
+    [hit] = index.search(["rain"])
+    assert hit.date == "2021-03-03"
+
+    os.remove(tmp_path / "notes.txt")
+    assert index.update_folder(str(tmp_path), recursive=True) == (1, 1)
+    assert len(index.search(["nested"])) == 1
@@ -0,0 +1,53 @@
+import pytest
+
+from transcription_cache import TranscriptionCache
+
+
+@pytest.fixture
+def cache():
+    cache = TranscriptionCache(":memory:")
+    yield cache
+    cache.close()
+
+
+def test_make_key_depends_on_every_part():
+    key = TranscriptionCache.make_key(b"image", "prompt", "model")
+    assert key == TranscriptionCache.make_key(b"image", "prompt", "model")
+    assert key != TranscriptionCache.make_key(b"other", "prompt", "model")
+    assert key != TranscriptionCache.make_key(b"image", "other", "model")
+    assert key != TranscriptionCache.make_key(b"image", "prompt", "other")
+
+
+def test_make_key_parts_cannot_shift():
+    assert (TranscriptionCache.make_key(b"image", "prompt", "ab")
+            != TranscriptionCache.make_key(b"image", "bprompt", "a"))
+
+
+def test_get_and_put(cache):
+    key = TranscriptionCache.make_key(b"image", "prompt", "model")
+    assert cache.get(key) is None
+    cache.put(key, "March 3, 2021")
+    assert cache.get(key) == "March 3, 2021"
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1, "bytes": len("March 3, 2021")}
+
+
+def test_evicts_least_recently_used():
+    cache = TranscriptionCache(":memory:", max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    cache.get("a")  # b is now the least recently used
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+    cache.close()
+
+
+def test_persists(tmp_path):
+    path = str(tmp_path / "cache" / "transcriptions.sqlite3")
+    cache = TranscriptionCache(path)
+    cache.put("key", "text")
+    cache.close()
+    cache = TranscriptionCache(path)
+    assert cache.get("key") == "text"
+    cache.close()
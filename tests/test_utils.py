@@ -0,0 +1,35 @@
+import pytest
+from PIL import Image
+
+from utils import ImageHandle
+
+
+@pytest.fixture
+def large_jpeg(tmp_path):
+    path = str(tmp_path / "page.jpg")
+    Image.new("RGB", (6000, 4000), "white").save(path, quality=50)
+    return path
+
+
+def test_decode_uses_draft_scale(large_jpeg):
+    # The decoder never goes below the requested size: 1/2 still covers 2048
+    assert ImageHandle(large_jpeg).decode(2048).size == (3000, 2000)
+
+
+def test_preview_decodes_at_one_eighth(large_jpeg):
+    handle = ImageHandle(large_jpeg)
+    assert handle.decode(300).size == (750, 500)
+    assert handle.thumbnail((300, 300)).size == (300, 200)
+
+
+def test_decode_reuses_a_large_enough_image(large_jpeg):
+    handle = ImageHandle(large_jpeg)
+    first = handle.decode(2048)
+    assert handle.decode(300) is first
+    assert handle.decode().size == (6000, 4000)
+
+
+def test_png_decodes_at_full_size(tmp_path):
+    path = str(tmp_path / "page.png")
+    Image.new("RGB", (1200, 800), "white").save(path)
+    assert ImageHandle(path).decode(300).size == (1200, 800)